@@ -0,0 +1,42 @@
+# language=rst
+"""Micro-benchmarks for :mod:`aiohttp_extras._conditional`.
+
+Usage::
+
+    python benchmarks/bench_conditional.py
+
+"""
+import timeit
+
+from aiohttp_extras import _conditional
+
+HEADERS = {
+    'single': '"ZGVhZGJlZWZkZWFkYmVlZmRlYWRiZWVm"',
+    'weak': 'W/"ZGVhZGJlZWZkZWFkYmVlZmRlYWRiZWVm"',
+    'list': '"Zm9v", "YmFy", W/"YmF6"',
+}
+
+
+def _uncached(header):
+    return frozenset(
+        match[1] for match in _conditional._ETAG_ITER_PATTERN.finditer(header)
+    ) if _conditional._ETAGS_PATTERN.fullmatch(header) else None
+
+
+def main(number=200000):
+    for name, header in HEADERS.items():
+        timings = {
+            'regex': timeit.timeit(lambda: _uncached(header), number=number),
+            'fast path': timeit.timeit(
+                lambda: _conditional._parse_single_etag(header), number=number
+            ),
+            'cached': timeit.timeit(
+                lambda: _conditional._parse_etags(header), number=number
+            ),
+        }
+        for variant, seconds in timings.items():
+            print('%-8s %-10s %8.0f ns/op' % (name, variant, seconds / number * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# language=rst
+"""Benchmark of :class:`aiohttp_extras.View` instantiation.
+
+Usage::
+
+    python benchmarks/bench_view.py
+
+"""
+import timeit
+
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+import aiohttp_extras
+
+
+class Member(aiohttp_extras.View):
+    pass
+
+
+def main(number=100000):
+    app = web.Application()
+    Member.add_to_router(app.router, '/collections/{collection}/members/{member}')
+    request = make_mocked_request('GET', '/collections/foo', app=app)
+    resource = Member.aiohttp_resource()
+
+    def url_round_trip():
+        # What the constructor used to do for every embedded view:
+        rel_url = resource.url_for(collection='foo', member='bar')
+        return dict(resource._match(rel_url.raw_path))
+
+    variants = {
+        'URL round trip (old)': url_round_trip,
+        'View(request, match_dict)': lambda: Member(
+            request, {'collection': 'foo', 'member': 'bar'}
+        ),
+        'View.from_match()': lambda: Member.from_match(
+            request, {'collection': 'foo', 'member': 'bar'}
+        ),
+    }
+    for name, f in variants.items():
+        seconds = timeit.timeit(f, number=number)
+        print('%-28s %10.0f views/s' % (name, number / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -69,6 +69,10 @@ setup(
         'swagger-parser',
     ],
     extras_require={
+        'compression': [
+            'brotli',
+            'zstandard',
+        ],
         'docs': [
             'MacFSEvents',
             'Sphinx',
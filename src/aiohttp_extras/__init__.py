@@ -1,6 +1,12 @@
+from ._batch import BatchView
+
+from ._cache import RepresentationCache
+
 from ._conditional import (
+    CollectionETag,
     etag_from_float,
     etag_from_int,
+    etag_of,
     ETagGenerator,
     ETagMixin
 )
@@ -12,4 +18,6 @@ from ._json import (
     encode
 )
 
+from ._pagination import KeysetPaginationMixin
+
 from ._view import View
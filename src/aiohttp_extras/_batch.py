@@ -0,0 +1,175 @@
+# language=rst
+"""
+
+Batch GET requests, dispatched in-process.
+
+A web page that shows many small resources would otherwise need as many GET
+requests, each with its own HTTP, middleware and authorization overhead.  A
+:class:`BatchView` accepts a list of relative URLs in a single POST request,
+resolves them to :class:`~aiohttp_extras.View` classes through
+:meth:`View.resolve_url() <aiohttp_extras.View.resolve_url>`, and streams the
+results back in one JSON response.
+
+Example::
+
+    BatchView.add_to_router(app.router, '/batch')
+
+Request body::
+
+    ["/items/1", "/items/2?embed=owner", "/nothing/here"]
+
+Response body::
+
+    [
+        {"href": "/items/1", "status": 200, "etag": "\\"abc\\"", "body": {...}},
+        {"href": "/items/2?embed=owner", "status": 200, "body": {...}},
+        {"href": "/nothing/here", "status": 404}
+    ]
+
+Only views that set :attr:`View.batchable <aiohttp_extras.View.batchable>`
+are reachable through a batch endpoint; other URLs get status ``404``.  URLs
+must be relative, starting with a single ``/``; others get status ``400``.
+
+Each body is the ``application/json`` representation of the view, as
+rendered for a ``GET`` request: by the same serializer (so
+:class:`~aiohttp_extras.serializers.hal_json.HALJSONMixin` views include their
+``_links`` and ``_embedded`` members), with the same ``ETag:``, and from and
+into the same :attr:`~aiohttp_extras.View.representation_cache`.  All requests
+in a batch share their :mod:`batch loaders <aiohttp_extras._loader>`, so
+views that implement :attr:`~aiohttp_extras.View.batch_load` load their data
+in as few calls as possible.
+
+Warning:
+    Batched requests are rendered by views directly, without calling their
+    request handlers, so **middlewares, and decorators on** ``get()``, **don't
+    run for them**.  Views that rely on either, e.g. for authorization, must
+    not be batchable.
+
+"""
+import asyncio
+import collections
+import json
+import logging
+import typing as T
+
+from aiohttp import web, hdrs
+from aiohttp.web_urldispatcher import UrlMappingMatchInfo
+
+from . import _loader, _view
+
+_logger = logging.getLogger(__name__)
+
+
+def _encode_result(href: str, status: int, etag: T.Optional[str]=None,
+                   body: T.Optional[bytes]=None) -> bytes:
+    result = {'href': href, 'status': status}
+    if etag is not None:
+        result['etag'] = etag
+    encoded = json.dumps(result, separators=(',', ':')).encode()
+    if body is None:
+        return encoded
+    # The body is encoded JSON already, so it's spliced in as is:
+    return encoded[:-1] + b',"body":' + body + b'}'
+
+
+class BatchView(_view.View):
+    # language=rst
+    """Endpoint for batches of GET requests.
+
+    The request headers of the batch request, including ``Authorization:``,
+    apply to all requests in the batch.
+
+    """
+
+    max_batch_size = 100
+    # language=rst
+    """Maximum number of URLs in a single batch."""
+
+    max_concurrency = 8
+    # language=rst
+    """Maximum number of requests in a batch that are handled concurrently."""
+
+    # A batch endpoint only accepts POST requests:
+    get = None
+    head = None
+
+    async def _urls(self) -> T.List[str]:
+        try:
+            urls = json.loads(await self.request.text())
+        except ValueError:
+            raise web.HTTPBadRequest(text="Request body must be JSON") from None
+        if not isinstance(urls, list) or \
+                not all(isinstance(url, str) for url in urls):
+            raise web.HTTPBadRequest(text="Expected an array of relative URLs")
+        if len(urls) > self.max_batch_size:
+            raise web.HTTPBadRequest(
+                text="At most %d URLs per batch" % self.max_batch_size
+            )
+        return urls
+
+    async def _get_item(self, template: web.Request, url: str) -> bytes:
+        # language=rst
+        """The result for ``url``, as an encoded JSON object."""
+        if url[:1] != '/' or url[:2] == '//':
+            return _encode_result(url, 400)
+        try:
+            rel_url = web.URL(url)
+        except ValueError:
+            return _encode_result(url, 400)
+        if rel_url.scheme or rel_url.host:
+            return _encode_result(url, 400)
+        resolved = _view.View.resolve_url(self.request.app.router, rel_url)
+        if resolved is None or not resolved[0].batchable:
+            return _encode_result(url, 404)
+        view_class, match_dict = resolved
+        request = template.clone(rel_url=rel_url)
+        resource = view_class.aiohttp_resource()
+        match_info = UrlMappingMatchInfo(match_dict, next(iter(resource)))
+        match_info.add_app(self.request.app)
+        request._match_info = match_info
+        request[_loader._LOADERS] = template[_loader._LOADERS]
+        try:
+            etag, body = await view_class(request)._json_representation()
+        except web.HTTPException as e:
+            return _encode_result(url, e.status)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            _logger.exception("Batched request for %s failed.", url)
+            return _encode_result(url, 500)
+        return _encode_result(url, 200, etag, body)
+
+    async def _results(self, template: web.Request, urls: T.List[str]):
+        # language=rst
+        """Yields the encoded array of results, in order.
+
+        Up to :attr:`max_concurrency` requests are handled at once.
+
+        """
+        pending = collections.deque()
+        separator = b'['
+        try:
+            for url in urls:
+                if len(pending) >= self.max_concurrency:
+                    yield separator + await pending.popleft()
+                    separator = b','
+                pending.append(asyncio.ensure_future(self._get_item(template, url)))
+            while len(pending) > 0:
+                yield separator + await pending.popleft()
+                separator = b','
+        finally:
+            for task in pending:
+                task.cancel()
+        yield b'[]' if separator == b'[' else b']'
+
+    async def post(self) -> web.StreamResponse:
+        # Requests can't be cloned after their body has been read:
+        template = self.request.clone(method=hdrs.METH_GET)
+        # Batch loaders are shared by all requests in the batch:
+        template[_loader._LOADERS] = {}
+        urls = await self._urls()
+        response = web.StreamResponse()
+        response.headers[hdrs.CONTENT_TYPE] = 'application/json; charset=utf-8'
+        await self._write_body(response, self._results(template, urls))
+        await response.write_eof()
+        return response
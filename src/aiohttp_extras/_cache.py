@@ -0,0 +1,222 @@
+# language=rst
+"""
+
+A byte-budgeted cache of encoded response bodies.
+
+Views with an ETag can skip serialization entirely if an encoded
+representation with the same URL, content type and ETag has been sent before.
+A :class:`RepresentationCache` holds such representations, including their
+compressed variants, and evicts the least recently used ones when their total
+size exceeds a byte budget.
+
+One cache can be shared by many view classes, so that the budget applies to
+all of them together::
+
+    cache = aiohttp_extras.RepresentationCache(max_bytes=64 * 1024 * 1024)
+
+    class Dataset(aiohttp_extras.View):
+        representation_cache = cache
+
+Views that take long to render can also serve the last cached representation
+while a fresh one is generated in the background; see
+:attr:`View.stale_while_revalidate <aiohttp_extras.View.stale_while_revalidate>`.
+
+"""
+import asyncio
+import collections
+import logging
+import time
+import typing as T
+
+from . import _content_coding
+
+_logger = logging.getLogger(__name__)
+
+_Key = T.Tuple[str, str, str]
+
+
+class RepresentationCache:
+    # language=rst
+    """LRU cache of :class:`~aiohttp_extras._content_coding.Representation`\\s.
+
+    Keys are tuples ``(canonical_rel_url, content_type, etag)``.
+
+    Parameters:
+        max_bytes: the total size of all cached bodies and compressed
+            variants.
+        max_entry_bytes: bodies larger than this aren't cached.  Defaults to
+            a quarter of ``max_bytes``.
+        max_revalidations: maximum number of concurrent background
+            revalidations, for all views sharing this cache.
+
+    Attributes:
+        hits (int): number of successful lookups.
+        misses (int): number of failed lookups.
+        stale_hits (int): number of stale representations served.
+        evictions (int): number of representations evicted to stay within
+            the byte budget.
+
+    """
+    def __init__(self, max_bytes: int, max_entry_bytes: T.Optional[int]=None,
+                 max_revalidations: int=4):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 4 if max_entry_bytes is None \
+            else max_entry_bytes
+        self.max_revalidations = max_revalidations
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._sizes = {}
+        self._nbytes = 0
+        # Most recently stored key per (canonical_rel_url, content_type):
+        self._latest = {}
+        # When each representation was last known to be fresh:
+        self._validated_at = {}
+        self._revalidating = set()
+        self._semaphore = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        # language=rst
+        """Total size of all cached representations."""
+        return self._nbytes
+
+    def get(self, key: _Key) -> T.Optional[_content_coding.Representation]:
+        representation = self._entries.get(key)
+        if representation is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        self._validated_at[key] = time.monotonic()
+        return representation
+
+    def stale(self, key: _Key, max_staleness: float) \
+            -> T.Optional[T.Tuple[_Key, _content_coding.Representation]]:
+        # language=rst
+        """The latest representation with the URL and content type of ``key``.
+
+        Parameters:
+            key: the key of the current, missing, representation.
+            max_staleness: maximum number of seconds since the representation
+                was last known to be fresh.
+
+        Returns:
+            A tuple ``(stale_key, representation)``, or ``None`` if there's no
+            representation that is fresh enough.
+
+        """
+        stale_key = self._latest.get(key[:2])
+        if stale_key is None or stale_key == key or \
+                time.monotonic() - self._validated_at[stale_key] > max_staleness:
+            return None
+        self.stale_hits += 1
+        self._entries.move_to_end(stale_key)
+        return stale_key, self._entries[stale_key]
+
+    def put(self, key: _Key, representation: _content_coding.Representation):
+        if key in self._entries:
+            self._discard(key)
+        if len(representation.body) > self.max_entry_bytes:
+            return
+        self._entries[key] = representation
+        self._latest[key[:2]] = key
+        self._validated_at[key] = time.monotonic()
+        self._resize(key)
+
+    def variant(self, key: _Key, representation: _content_coding.Representation,
+                encoding: str) -> bytes:
+        # language=rst
+        """The body of ``representation`` in content coding ``encoding``.
+
+        Like :meth:`Representation.variant()
+        <aiohttp_extras._content_coding.Representation.variant>`, but also
+        accounts for the size of newly created variants.
+
+        """
+        result = representation.variant(encoding)
+        if self._entries.get(key) is representation:
+            self._resize(key)
+        return result
+
+    def _discard(self, key: _Key):
+        del self._entries[key]
+        del self._validated_at[key]
+        self._nbytes -= self._sizes.pop(key)
+        if self._latest.get(key[:2]) == key:
+            del self._latest[key[:2]]
+
+    def _resize(self, key: _Key):
+        nbytes = self._entries[key].nbytes
+        self._nbytes += nbytes - self._sizes.get(key, 0)
+        self._sizes[key] = nbytes
+        while self._nbytes > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def tee(self, key: _Key, chunks: T.AsyncIterable[bytes],
+                  level: T.Optional[int]=None) -> T.AsyncIterator[bytes]:
+        # language=rst
+        """Yields ``chunks``, and caches their concatenation when done.
+
+        Nothing is cached if the body grows larger than :attr:`max_entry_bytes`,
+        or if iteration doesn't complete.
+
+        Parameters:
+            key: the cache key.
+            chunks: the encoded, uncompressed response body.
+            level: compression level of the representation's compressed
+                variants.
+
+        """
+        body = bytearray()
+        async for chunk in chunks:
+            if body is not None:
+                body.extend(chunk)
+                if len(body) > self.max_entry_bytes:
+                    body = None
+            yield chunk
+        if body is not None:
+            self.put(key, _content_coding.Representation(
+                body, key[1], key[2], level
+            ))
+
+    def revalidate(self, key: _Key,
+                   generate: T.Callable[[], T.Awaitable[T.AsyncIterable[bytes]]],
+                   level: T.Optional[int]=None):
+        # language=rst
+        """Generates the representation for ``key`` in the background.
+
+        Does nothing if the representation with this URL and content type is
+        already being revalidated.
+
+        Parameters:
+            key: the cache key.
+            generate: coroutine function returning the encoded, uncompressed
+                response body.
+            level: see :meth:`tee`.
+
+        """
+        if key[:2] in self._revalidating:
+            return
+        self._revalidating.add(key[:2])
+        asyncio.ensure_future(self._revalidate(key, generate, level))
+
+    async def _revalidate(self, key, generate, level):
+        try:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_revalidations)
+            async with self._semaphore:
+                async for _ in self.tee(key, await generate(), level):
+                    pass
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            _logger.exception("Revalidation of %s failed.", key[0])
+        finally:
+            self._revalidating.discard(key[:2])
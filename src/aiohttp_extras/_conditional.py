@@ -62,6 +62,11 @@ To facilitate the creation of valid ETags for your resources, this library provi
     floating point values to very compact ETags.
 -   :class:`ETagGenerator` can create a unique ETag from any (complex) value,
     using canonical JSON encoding and SHA3_224 hashing.
+-   :func:`etag_of` does the same from within a coroutine, without blocking
+    the event loop on large values.
+-   :class:`CollectionETag` maintains the ETag of a (large) collection from the
+    ETags of its members, and can be updated incrementally when members are
+    added, changed or removed.
 
 
 API documentation
@@ -70,6 +75,7 @@ API documentation
 """
 
 import abc
+import asyncio
 import logging
 import typing as T
 import re
@@ -78,10 +84,13 @@ import struct
 import json
 import hashlib
 import functools
-from collections.abc import Mapping
+import concurrent.futures
+from collections.abc import Mapping, MutableMapping, Sized
 
 from aiohttp import web, hdrs
 
+from . import _content_coding
+
 _logger = logging.getLogger(__name__)
 
 
@@ -98,10 +107,14 @@ _HTTP_SAFE_METHODS_INCL_POST = {'GET', 'HEAD', 'OPTIONS', 'POST'}
 _VALID_ETAG_CHARS = re.compile(r'[\x21\x23-\x7e\x80-\xff]+')
 _IF_MATCH = 'If-Match'
 _IF_NONE_MATCH = 'If-None-Match'
+_ETAG_EXECUTOR_THRESHOLD = 10000
+
+
+_PARSED_IF_HEADER_CACHE_SIZE = 1024
 
 
 def _parse_if_header(request: web.Request, header_name: str) \
-        -> T.Union[None, T.Set[str], _STAR_TYPE]:
+        -> T.Union[None, T.FrozenSet[str], _STAR_TYPE]:
     # language=rst
     """Parses ``If-(None-)Match:`` request headers.
 
@@ -110,9 +123,9 @@ def _parse_if_header(request: web.Request, header_name: str) \
         header_name:  either ``'If-Match'`` or ``'If-None-Match'``
 
     Returns:
-        T.Union[None, T.Set, _STAR_TYPE]: ``None`` if the header is not present
-        in the request.  Otherwise a `set` of ETags or string literal
-        ``"*"`` as found in the request header.
+        T.Union[None, T.FrozenSet, _STAR_TYPE]: ``None`` if the header is not
+        present in the request.  Otherwise a `frozenset` of ETags or string
+        literal ``"*"`` as found in the request header.
 
     Raises:
         web.HTTPBadRequest: If the request header is malformed.
@@ -130,11 +143,60 @@ def _parse_if_header(request: web.Request, header_name: str) \
         return None
     if header == _STAR:
         return _STAR
+    return _parse_etags(header)
+
+
+def _parse_single_etag(header: str) -> T.Optional[str]:
+    # language=rst
+    """Fast path for a header value consisting of exactly one ETag.
+
+    Returns:
+        The ETag, or ``None`` if ``header`` isn't a single, syntactically valid
+        ETag.  In the latter case, the caller must fall back to the full parser.
+
+    """
+    etag = header.lstrip()
+    start = 3 if etag.startswith('W/"') else 1
+    if (
+        len(etag) < start + 2 or
+        etag[start - 1] != '"' or
+        etag[-1] != '"' or
+        etag.count('"') != 2
+    ):
+        return None
+    opaque = etag[start:-1]
+    # Accepts a strict subset of valid ETags: printable ASCII without spaces.
+    # Anything else, including obs-text, is left to the full parser.
+    if (
+        not opaque.isprintable() or
+        ' ' in opaque or
+        len(opaque.encode()) != len(opaque)
+    ):
+        return None
+    return etag
+
+
+@functools.lru_cache(maxsize=_PARSED_IF_HEADER_CACHE_SIZE)
+def _parse_etags(header: str) -> T.FrozenSet[str]:
+    # language=rst
+    """Parses a list of ETags, as found in ``If-(None-)Match:`` headers.
+
+    Polling clients send the same header value over and over again, so results
+    are cached in a bounded LRU cache, keyed by the raw header value.
+
+    Raises:
+        web.HTTPBadRequest: If the header value is malformed.  Errors are not
+            cached.
+
+    """
+    etag = _parse_single_etag(header)
+    if etag is not None:
+        return frozenset((etag,))
     if not _ETAGS_PATTERN.fullmatch(header):
         raise web.HTTPBadRequest(
             text="Syntax error in request header If-Match: %s" % header
         )
-    return {match[1] for match in _ETAG_ITER_PATTERN.finditer(header)}
+    return frozenset(match[1] for match in _ETAG_ITER_PATTERN.finditer(header))
 
 
 def _match_etags(etag: str, etags: T.Iterable[str], allow_weak: bool) -> bool:
@@ -151,9 +213,22 @@ def _match_etags(etag: str, etags: T.Iterable[str], allow_weak: bool) -> bool:
             algorithm;  otherwise *strong comparison* is used.
 
     Returns:
-        ``True`` if ``etag`` matches against any ETag in ``etags``.
+        ``True`` if ``etag``, or its variant in any content coding (see
+        :func:`_content_coding.coded_etag`), matches against any ETag in
+        ``etags``.
 
     """
+    if _match_etag(etag, etags, allow_weak):
+        return True
+    if etag[:1] != '"':
+        return False
+    return any(
+        _match_etag(coded, etags, allow_weak)
+        for coded in _content_coding.coded_etags(etag)
+    )
+
+
+def _match_etag(etag: str, etags: T.Iterable[str], allow_weak: bool) -> bool:
     if not allow_weak:
         return str(etag)[0] == '"' and etag in etags
     if etag[0:2] == 'W/':
@@ -200,7 +275,7 @@ def _assert_if_match(request:       web.Request,
         if etag is None or etag is False:
             raise web.HTTPPreconditionFailed(text=_IF_MATCH)
         return False
-    # From here on, `etags` can only be a set().
+    # From here on, `etags` can only be a frozenset().
     if etag is True:
         raise web.HTTPPreconditionFailed(
             text="Resource doesn't have an ETag."
@@ -261,7 +336,7 @@ def _assert_if_none_match(request:      web.Request,
         return True
     if etags is _STAR:
         raise web.HTTPPreconditionFailed(text=_IF_NONE_MATCH)
-    # From here on, we know that etags is a set of strings.
+    # From here on, we know that etags is a frozenset of strings.
     if etag is True:
         raise web.HTTPPreconditionFailed(
             text="Resource doesn't have an ETag."
@@ -386,6 +461,15 @@ def _json_dumps_default(value):
     raise TypeError()
 
 
+def _canonical_json(v: T.Any) -> bytes:
+    # Option "sort_keys=True" is here to make the JSON serialization
+    # deterministic. This guarantees that you'll get the same ETag every
+    # time you use ETagGenerator en the same dictionary.
+    return json.dumps(
+        v, ensure_ascii=False, sort_keys=True, default=_json_dumps_default
+    ).encode()
+
+
 class ETagGenerator:
     # language=rst
     """Helper class to facilitate creation of ETags.
@@ -407,6 +491,11 @@ class ETagGenerator:
         some_other_internal_state = ...
         etag = ETagGenerator(some_internal_state, some_other_internal_state).etag
 
+    From within a coroutine, large states can be hashed without blocking the
+    event loop::
+
+        etag = await etag_of(some_huge_internal_state)
+
     Note:
         If you want to create an ETag based on only an integer or floating point
         value (including time-stamps!), you could use :func:`etag_from_int` or
@@ -430,12 +519,40 @@ class ETagGenerator:
             ETagGenerator: self
 
         """
-        # Option "sort_keys=True" is here to make the JSON serialization
-        # deterministic. This guarantees that you'll get the same ETag every
-        # time you use ETagGenerator en the same dictionary.
-        self._hash.update(
-            json.dumps(v, ensure_ascii=False, sort_keys=True, default=_json_dumps_default).encode()
-        )
+        self._hash.update(_canonical_json(v))
+        return self
+
+    async def aupdate(self, v: T.Any,
+                      executor: T.Optional[concurrent.futures.Executor]=None,
+                      threshold: int=_ETAG_EXECUTOR_THRESHOLD):
+        # language=rst
+        """Like :meth:`update`, but hashes large values in an executor.
+
+        Canonicalization and hashing of a multi-megabyte state would otherwise
+        block all other connections on the event loop.  This method moves that
+        work off the event loop; it doesn't make it any faster.
+
+        Parameters:
+            v: see :meth:`update`
+            executor: the executor to use, or ``None`` for the event loop's
+                default executor.
+            threshold: values of at least ``threshold`` elements are hashed
+                in the executor; smaller values are hashed inline.  Elements
+                are counted recursively: characters of strings, plus items
+                (and their elements) of containers.
+
+        Returns:
+            ETagGenerator: self
+
+        Warning:
+            ``v`` must not be modified until the returned coroutine completes,
+            and calls on the same instance must not overlap.
+
+        """
+        if _size_at_least(v, threshold):
+            await asyncio.get_event_loop().run_in_executor(executor, self.update, v)
+        else:
+            self.update(v)
         return self
 
     @property
@@ -456,6 +573,231 @@ class ETagGenerator:
         )
 
 
+def _size_at_least(v: T.Any, threshold: int) -> bool:
+    # language=rst
+    """Whether ``v`` has at least ``threshold`` elements, counted recursively.
+
+    Stops counting as soon as ``threshold`` is reached, so that the cost is
+    bounded by ``threshold`` even for huge values.
+
+    """
+    size = 0
+    stack = [v]
+    while len(stack) > 0:
+        v = stack.pop()
+        if isinstance(v, (str, bytes, bytearray)):
+            size += len(v)
+        elif isinstance(v, Sized) and isinstance(v, T.Iterable):
+            size += len(v)
+            if size >= threshold:
+                return True
+            stack.extend(v.values() if isinstance(v, Mapping) else v)
+        else:
+            size += 1
+        if size >= threshold:
+            return True
+    return False
+
+
+_EMPTY_DIGEST = hashlib.sha3_224().digest()
+
+
+class _CollectionETagNode:
+    # language=rst
+    """Node in the hash tree of a :class:`CollectionETag`.
+
+    Nodes are ordered by :attr:`key` and heap-ordered by :attr:`priority`,
+    which is derived from the key itself.  The shape of the tree therefore
+    depends only on the set of keys, not on the order in which they were
+    inserted.
+
+    """
+    __slots__ = ('key', 'etag', 'priority', 'leaf', 'left', 'right', 'digest')
+
+    def __init__(self, key: str, etag: str):
+        self.key = key
+        self.priority = hashlib.sha3_224(key.encode()).digest()
+        self.left = None
+        self.right = None
+        self.digest = None
+        self.set_etag(etag)
+
+    def set_etag(self, etag: str):
+        encoded_key = self.key.encode()
+        self.etag = etag
+        self.leaf = struct.pack('>I', len(encoded_key)) + encoded_key + etag.encode()
+
+    def rehash(self):
+        h = hashlib.sha3_224()
+        h.update(_EMPTY_DIGEST if self.left is None else self.left.digest)
+        h.update(self.leaf)
+        h.update(_EMPTY_DIGEST if self.right is None else self.right.digest)
+        self.digest = h.digest()
+
+
+def _split(node: T.Optional[_CollectionETagNode], key: str):
+    # language=rst
+    """Splits a subtree in the nodes with keys ``< key`` and ``>= key``."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        node.rehash()
+        return node, right
+    left, right = _split(node.left, key)
+    node.left = right
+    node.rehash()
+    return left, node
+
+
+def _merge(left: T.Optional[_CollectionETagNode],
+           right: T.Optional[_CollectionETagNode]):
+    # language=rst
+    """Merges two subtrees; all keys in ``left`` must precede all keys in ``right``."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.rehash()
+        return left
+    right.left = _merge(left, right.left)
+    right.rehash()
+    return right
+
+
+def _delete(node: T.Optional[_CollectionETagNode], key: str):
+    if node is None:
+        raise KeyError(key)
+    if key < node.key:
+        node.left = _delete(node.left, key)
+    elif node.key < key:
+        node.right = _delete(node.right, key)
+    else:
+        return _merge(node.left, node.right)
+    node.rehash()
+    return node
+
+
+class CollectionETag(MutableMapping):
+    # language=rst
+    """ETag of a collection, computed from the ETags of its members.
+
+    The member ETags are combined in a balanced hash tree (a Merkle tree), so
+    that adding, changing or removing a single member costs *O(log n)* instead
+    of rehashing the entire collection.  A large collection can thus keep a
+    "live" instance of this class, update it on every write, and serve its
+    :attr:`etag` on every ``GET`` for free.
+
+    Instances behave like a mutable mapping from member keys to member ETags::
+
+        collection_etag = CollectionETag({
+            'alice': etag_from_int(3),
+            'bob': etag_from_int(7),
+        })
+        collection_etag['carol'] = etag_from_int(1)  # insert
+        collection_etag['alice'] = etag_from_int(4)  # update
+        del collection_etag['bob']                   # delete
+
+        etag = collection_etag.etag
+
+    The resulting ETag depends only on the current key→ETag pairs, not on the
+    order in which they were inserted.
+
+    """
+    def __init__(self, members: T.Optional[T.Mapping[str, str]]=None):
+        self._root = None
+        self._len = 0
+        if members is not None:
+            self.update(members)
+
+    def _find(self, key: str) -> T.Optional[_CollectionETagNode]:
+        node = self._root
+        while node is not None:
+            if key < node.key:
+                node = node.left
+            elif node.key < key:
+                node = node.right
+            else:
+                return node
+        return None
+
+    def __getitem__(self, key: str) -> str:
+        node = self._find(key)
+        if node is None:
+            raise KeyError(key)
+        return node.etag
+
+    def __setitem__(self, key: str, etag: str):
+        path = []
+        node = self._root
+        while node is not None:
+            path.append(node)
+            if key < node.key:
+                node = node.left
+            elif node.key < key:
+                node = node.right
+            else:
+                node.set_etag(etag)
+                for n in reversed(path):
+                    n.rehash()
+                return
+        new_node = _CollectionETagNode(key, etag)
+        new_node.rehash()
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, new_node), right)
+        self._len += 1
+
+    def __delitem__(self, key: str):
+        self._root = _delete(self._root, key)
+        self._len -= 1
+
+    def __iter__(self) -> T.Iterator[str]:
+        stack = []
+        node = self._root
+        while stack or node is not None:
+            if node is not None:
+                stack.append(node)
+                node = node.left
+            else:
+                node = stack.pop()
+                yield node.key
+                node = node.right
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def etag(self) -> str:
+        # language=rst
+        """The strong ETag of the collection in its current state."""
+        digest = _EMPTY_DIGEST if self._root is None else self._root.digest
+        return _etaggify(base64.urlsafe_b64encode(digest).decode())
+
+
+async def etag_of(*values: T.Any,
+                  executor: T.Optional[concurrent.futures.Executor]=None) -> str:
+    # language=rst
+    """Returns an ETag for ``values``, without blocking the event loop.
+
+    This is the asynchronous counterpart of ``ETagGenerator(*values).etag``,
+    and returns the same ETag.  See :meth:`ETagGenerator.aupdate` for details.
+
+    Example::
+
+        class MyView(aiohttp_extras.View, aiohttp_extras.ETagMixin):
+            async def etag(self):
+                return await etag_of(await self.huge_state())
+
+    """
+    etag_generator = ETagGenerator()
+    for value in values:
+        await etag_generator.aupdate(value, executor=executor)
+    return etag_generator.etag
+
+
 class ETagMixin(abc.ABC):
     # language=rst
     """
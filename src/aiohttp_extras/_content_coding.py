@@ -0,0 +1,202 @@
+# language=rst
+"""
+
+This module provides the *content codings* (ie. compression algorithms) that
+can be negotiated through the ``Accept-Encoding:`` request header.
+
+``gzip`` is always available.  ``br`` (Brotli) and ``zstd`` (Zstandard) are
+available if the optional :mod:`brotli` and :mod:`zstandard` packages are
+installed::
+
+    pip install datapunt-aiohttp-extras[compression]
+
+Each content coding produces a different representation, so strong ETags are
+made coding-specific with :func:`coded_etag`.
+
+Compressing the same representation for every request is wasteful.  A
+:class:`Representation` holds an encoded response body together with its
+compressed variants, which are computed once, on first use.
+
+"""
+import collections.abc
+import logging
+import typing as T
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+_logger = logging.getLogger(__name__)
+
+IDENTITY = 'identity'
+GZIP = 'gzip'
+BROTLI = 'br'
+ZSTD = 'zstd'
+
+BROTLI_DEFAULT_QUALITY = 4
+# language=rst
+"""Brotli quality if no compression level is given.
+
+Brotli's own default, quality 11, is far too slow to compress responses on the
+event loop.
+
+"""
+
+_Level = T.Union[None, int, T.Mapping[str, int]]
+
+
+class _BrotliCompressObj:
+    # language=rst
+    """Adapts :class:`brotli.Compressor` to the interface of :func:`zlib.compressobj`."""
+
+    def __init__(self, level: T.Optional[int]):
+        self._compressor = brotli.Compressor(
+            quality=BROTLI_DEFAULT_QUALITY if level is None else level
+        )
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _gzip_compressobj(level: T.Optional[int]):
+    return zlib.compressobj(
+        zlib.Z_DEFAULT_COMPRESSION if level is None else level,
+        zlib.DEFLATED,
+        16 + zlib.MAX_WBITS
+    )
+
+
+def _zstd_compressobj(level: T.Optional[int]):
+    compressor = zstandard.ZstdCompressor() if level is None \
+        else zstandard.ZstdCompressor(level=level)
+    return compressor.compressobj()
+
+
+_COMPRESSOBJ_FACTORIES = dict(
+    (encoding, factory) for encoding, factory, available in (
+        (BROTLI, _BrotliCompressObj, brotli is not None),
+        (ZSTD, _zstd_compressobj, zstandard is not None),
+        (GZIP, _gzip_compressobj, True),
+    ) if available
+)
+
+AVAILABLE_CONTENT_ENCODINGS = tuple(_COMPRESSOBJ_FACTORIES) + (IDENTITY,)
+# language=rst
+"""All content codings supported in this installation, best first.
+
+Always ends with ``'identity'``, ie. no compression at all.
+
+"""
+
+
+def compressobj(encoding: str, level: _Level=None):
+    # language=rst
+    """Returns a streaming compressor for content coding ``encoding``.
+
+    The returned object has the same interface as the objects returned by
+    :func:`zlib.compressobj`: methods ``compress(data)`` and ``flush()`` both
+    return the compressed bytes produced so far.
+
+    Parameters:
+        encoding: one of :const:`AVAILABLE_CONTENT_ENCODINGS`, except
+            ``'identity'``.
+        level: compression level, or ``None`` for the algorithm's default
+            (:const:`BROTLI_DEFAULT_QUALITY` for Brotli).  The meaning and
+            range of this value depend on the algorithm, so this can also be
+            a mapping from content codings to levels.
+
+    Raises:
+        ValueError: if ``encoding`` isn't available.
+
+    """
+    try:
+        factory = _COMPRESSOBJ_FACTORIES[encoding]
+    except KeyError:
+        raise ValueError("Unavailable content coding: %s" % encoding) from None
+    if isinstance(level, collections.abc.Mapping):
+        level = level.get(encoding)
+    return factory(level)
+
+
+def compress(data: bytes, encoding: str, level: _Level=None) -> bytes:
+    # language=rst
+    """Compresses ``data`` in one go.  See :func:`compressobj`."""
+    if encoding == IDENTITY:
+        return data
+    c = compressobj(encoding, level)
+    return c.compress(data) + c.flush()
+
+
+def coded_etag(etag: str, encoding: str) -> str:
+    # language=rst
+    """The ETag of the variant in content coding ``encoding``.
+
+    :rfc:`7232#section-2.3.3` forbids sending the same strong ETag for
+    different representations, so strong ETags get the coding as a suffix, eg.
+    ``"abc"`` becomes ``"abc-gzip"``.  Weak ETags are returned unchanged.
+
+    """
+    if encoding == IDENTITY or etag[:1] != '"':
+        return etag
+    return etag[:-1] + '-' + encoding + '"'
+
+
+def coded_etags(etag: str) -> T.Iterator[str]:
+    # language=rst
+    """All ETags :func:`coded_etag` can produce from ``etag``, including itself."""
+    yield etag
+    if etag[:1] == '"':
+        for encoding in (GZIP, BROTLI, ZSTD):
+            yield coded_etag(etag, encoding)
+
+
+class Representation:
+    # language=rst
+    """An encoded response body, with precompressed variants.
+
+    Compressed variants are created on demand, on first use, and then kept for
+    as long as this object lives.
+
+    Parameters:
+        body: the encoded, uncompressed response body.
+        content_type: the value of the ``Content-Type:`` header.
+        etag: the ETag of this representation, if any.
+        level: the compression level used for all variants.
+
+    """
+    __slots__ = ('body', 'content_type', 'etag', 'level', '_variants')
+
+    def __init__(self, body: bytes, content_type: str,
+                 etag: T.Optional[str]=None, level: _Level=None):
+        self.body = bytes(body)
+        self.content_type = content_type
+        self.etag = etag
+        self.level = level
+        self._variants = {}
+
+    def variant(self, encoding: str) -> bytes:
+        # language=rst
+        """The body in content coding ``encoding``, compressed if necessary."""
+        if encoding == IDENTITY:
+            return self.body
+        result = self._variants.get(encoding)
+        if result is None:
+            result = compress(self.body, encoding, self.level)
+            self._variants[encoding] = result
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        # language=rst
+        """Total size of the body and all compressed variants created so far."""
+        return len(self.body) + sum(len(v) for v in self._variants.values())
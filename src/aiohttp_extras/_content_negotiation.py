@@ -4,6 +4,11 @@
 To support *content type negotiation* in GET requests, this package provides the
 :meth:`@produces_content_types <produces_content_types>` decorator.
 
+Likewise, :meth:`@produces_content_encodings <produces_content_encodings>`
+negotiates the *content coding* (ie. compression) of the response, based on
+the ``Accept-Encoding:`` request header.  Don't forget to add
+``Accept-Encoding`` to the ``Vary:`` response header.
+
 """
 import logging
 import functools
@@ -11,75 +16,320 @@ import typing as T
 
 from aiohttp import web, hdrs
 
+from . import _content_coding
+
 _logger = logging.getLogger(__name__)
 
 _BCT_CACHED_VALUE_KEY = 'aiohttp_extras.best_content_type'
+_ACCEPT_CACHE_SIZE = 256
+_CONTENT_CODING_ALIASES = {
+    'x-gzip': _content_coding.GZIP,
+}
+
+_MediaType = T.Tuple[str, str, T.FrozenSet[T.Tuple[str, str]]]
+
+
+def _parse_parameters(parameters: T.Iterable[str]) \
+        -> T.Iterator[T.Tuple[str, str]]:
+    for parameter in parameters:
+        name, sep, value = parameter.partition('=')
+        name = name.strip().lower()
+        value = value.strip()
+        if not sep or not name:
+            raise ValueError(parameter)
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        if name == 'charset':
+            value = value.lower()
+        yield name, value
+
+
+def _parse_media_type(media_type: str) -> _MediaType:
+    # language=rst
+    """Parses a media type into ``(type, subtype, parameters)``.
+
+    Type, subtype, parameter names and charset values are case-insensitive, and
+    therefore normalized to lower case.
+
+    >>> _parse_media_type('Text/HTML; Charset="UTF-8"')
+    ('text', 'html', frozenset({('charset', 'utf-8')}))
+
+    Raises:
+        ValueError: if ``media_type`` is malformed.
+
+    """
+    media_range, *parameters = media_type.split(';')
+    main, sep, sub = media_range.strip().lower().partition('/')
+    if not sep or not main or not sub or '/' in sub:
+        raise ValueError(media_type)
+    return main, sub, frozenset(_parse_parameters(parameters))
+
+
+def _parse_accept(accept: str) -> T.List[T.Tuple[_MediaType, float]]:
+    # language=rst
+    """Parses an ``Accept:`` header value into ``(media range, q-value)`` pairs.
+
+    Accept extensions (ie. parameters following the ``q`` parameter) are
+    ignored.
+
+    Raises:
+        web.HTTPBadRequest: if the header is malformed.
+
+    """
+    result = []
+    for element in accept.split(','):
+        if element.strip() == '':
+            continue
+        media_range, *parameters = element.split(';')
+        qvalue = 1.0
+        for i, parameter in enumerate(parameters):
+            name, sep, value = parameter.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    raise web.HTTPBadRequest(
+                        text="Malformed Accept: header"
+                    ) from None
+                if not 0.0 <= qvalue <= 1.0:
+                    raise web.HTTPBadRequest(text="Malformed Accept: header")
+                parameters = parameters[:i]
+                break
+        try:
+            main, sub, params = _parse_media_type(';'.join([media_range] + parameters))
+        except ValueError:
+            raise web.HTTPBadRequest(text="Malformed Accept: header") from None
+        if main == '*' and sub != '*':
+            raise web.HTTPBadRequest(text="Malformed Accept: header")
+        result.append(((main, sub, params), qvalue))
+    return result
+
+
+class _ContentTypeMatcher:
+    # language=rst
+    """Matches ``Accept:`` headers against a fixed list of content types.
+
+    The available content types are parsed once, when the matcher is created.
+    Negotiation results are cached per raw ``Accept:`` header value, so for
+    repeat clients negotiation costs no more than a dictionary lookup.
+
+    Parameters:
+        available_content_types: an ordered list of available content types,
+            ordered by quality, best quality first.
+
+    """
+    def __init__(self, available_content_types: T.Iterable[str]):
+        self.available_content_types = tuple(available_content_types)
+        assert len(self.available_content_types) > 0
+        self._parsed = tuple(
+            _parse_media_type(available)
+            for available in self.available_content_types
+        )
+        self.not_acceptable_body = \
+            ",".join(self.available_content_types).encode('ascii')
+        self.best_match = functools.lru_cache(maxsize=_ACCEPT_CACHE_SIZE)(
+            self._best_match
+        )
+
+    def _best_match(self, accept: str) -> T.Optional[str]:
+        # language=rst
+        """The best available content type for ``accept``.
+
+        Implements :rfc:`section 5.3.2 <7231#section-5.3.2>`: the quality of an
+        available content type is the q-value of the *most specific* media
+        range that matches it.  The available content type with the highest
+        quality wins; ties are broken in favour of the content type listed
+        first.
+
+        Returns:
+            The best content type, or ``None`` if none is acceptable.
+
+        Raises:
+            web.HTTPBadRequest: if the header is malformed.
+
+        """
+        media_ranges = _parse_accept(accept)
+        best, best_qvalue = None, 0.0
+        for available, (main, sub, params) in zip(self.available_content_types,
+                                                   self._parsed):
+            specificity, qvalue = None, 0.0
+            for (r_main, r_sub, r_params), r_qvalue in media_ranges:
+                if (
+                    (r_main == '*' or r_main == main) and
+                    (r_sub == '*' or r_sub == sub) and
+                    r_params <= params
+                ):
+                    r_specificity = (r_main != '*', r_sub != '*', len(r_params))
+                    if specificity is None or r_specificity > specificity:
+                        specificity, qvalue = r_specificity, r_qvalue
+            if qvalue > best_qvalue:
+                best, best_qvalue = available, qvalue
+        return best
 
 
 def _best_content_type(request: web.Request,
-                       available_content_types: T.List[str]) -> str:
+                       matcher: _ContentTypeMatcher) -> str:
     # language=rst
     """The best matching content type.
 
     Returns:
         The best content type to use for the HTTP response, given a certain
-        ``request`` and a list of ``available_content_types``.
+        ``request`` and the content types available in ``matcher``.
 
     Parameters:
         request (aiohttp.web.Request): the current request
-        available_content_types: an ordered list of available content types,
-            ordered by quality, best quality first.
+        matcher: a matcher for the available content types.
 
     Raises:
         web.HTTPNotAcceptable: if none of the available content types are
             acceptable by the client. See :ref:`aiohttp web exceptions
             <aiohttp-web-exceptions>`.
+        web.HTTPBadRequest: if the ``Accept:`` header is malformed.
 
     Example::
 
-        AVAILABLE = [
+        MATCHER = _ContentTypeMatcher([
             'foo/bar',
             'foo/baz; charset="utf-8"'
-        ]
+        ])
         def handler(request):
-            bct = best_content_type(request, AVAILABLE)
+            bct = _best_content_type(request, MATCHER)
 
     """
     if hdrs.ACCEPT not in request.headers:
-        return available_content_types[0]
+        return matcher.available_content_types[0]
     accept = ','.join(request.headers.getall(hdrs.ACCEPT))
-    acceptable_content_types = dict()
-    for acceptable in accept.split(','):
-        try:
-            main, sub = acceptable.split(';', 2)[0].strip().split('/', 2)
-        except ValueError:
-            raise web.HTTPBadRequest(text="Malformed Accept: header") from None
-        if main not in acceptable_content_types:
-            acceptable_content_types[main] = set()
-        acceptable_content_types[main].add(sub)
-    # Try to find a matching 'main/sub' or 'main/*':
-    for available in available_content_types:
-        main, sub = available.split(';', 2)[0].strip().split('/', 2)
-        if main in acceptable_content_types:
-            subs = acceptable_content_types[main]
-            if sub in subs or '*' in subs:
-                return available
-    if '*' in acceptable_content_types and '*' in acceptable_content_types['*']:
-        return available_content_types[0]
-    # Darn, none of our content types are acceptable to the client:
-    body = ",".join(available_content_types).encode('ascii')
-    raise web.HTTPNotAcceptable(
-        body=body,
-        content_type='text/plain; charset="US-ASCII"'
+    best = matcher.best_match(accept)
+    if best is None:
+        # Darn, none of our content types are acceptable to the client:
+        raise web.HTTPNotAcceptable(
+            body=matcher.not_acceptable_body,
+            headers={hdrs.CONTENT_TYPE: 'text/plain; charset="US-ASCII"'}
+        )
+    return best
+
+
+def _parse_accept_encoding(accept_encoding: str) -> T.Dict[str, float]:
+    # language=rst
+    """Parses an ``Accept-Encoding:`` header value into a coding→q-value map.
+
+    Raises:
+        web.HTTPBadRequest: if the header is malformed.
+
+    """
+    result = {}
+    for element in accept_encoding.split(','):
+        coding, *parameters = element.split(';')
+        coding = coding.strip().lower()
+        if coding == '':
+            continue
+        coding = _CONTENT_CODING_ALIASES.get(coding, coding)
+        qvalue = 1.0
+        for parameter in parameters:
+            name, sep, value = parameter.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    raise web.HTTPBadRequest(
+                        text="Malformed Accept-Encoding: header"
+                    ) from None
+                if not 0.0 <= qvalue <= 1.0:
+                    raise web.HTTPBadRequest(
+                        text="Malformed Accept-Encoding: header"
+                    )
+        result[coding] = qvalue
+    return result
+
+
+class _ContentEncodingMatcher:
+    # language=rst
+    """Matches ``Accept-Encoding:`` headers against a fixed list of content codings.
+
+    Like :class:`_ContentTypeMatcher`, results are cached per raw header value.
+
+    Parameters:
+        available_content_encodings: an ordered list of available content
+            codings, best first.  ``'identity'`` is always available, and
+            implicitly appended if it's not in the list.
+
+    """
+    def __init__(self, available_content_encodings: T.Iterable[str]):
+        available = list(available_content_encodings)
+        if _content_coding.IDENTITY not in available:
+            available.append(_content_coding.IDENTITY)
+        self.available_content_encodings = tuple(available)
+        self.best_match = functools.lru_cache(maxsize=_ACCEPT_CACHE_SIZE)(
+            self._best_match
+        )
+
+    def _best_match(self, accept_encoding: str) -> str:
+        # language=rst
+        """The best available content coding for ``accept_encoding``.
+
+        Implements :rfc:`section 5.3.4 <7231#section-5.3.4>`.  If no content
+        coding is acceptable at all, this method returns ``'identity'`` anyway
+        instead of failing the request.
+
+        Raises:
+            web.HTTPBadRequest: if the header is malformed.
+
+        """
+        qvalues = _parse_accept_encoding(accept_encoding)
+        star = qvalues.get('*')
+        best, best_qvalue = _content_coding.IDENTITY, 0.0
+        for available in self.available_content_encodings:
+            if available in qvalues:
+                qvalue = qvalues[available]
+            elif star is not None:
+                qvalue = star
+            elif available == _content_coding.IDENTITY:
+                qvalue = 1.0
+            else:
+                qvalue = 0.0
+            if qvalue > best_qvalue:
+                best, best_qvalue = available, qvalue
+        return best
+
+
+def _best_content_encoding(request: web.Request,
+                           matcher: _ContentEncodingMatcher) -> str:
+    # language=rst
+    """The best matching content coding.
+
+    Returns ``'identity'`` if the request has no ``Accept-Encoding:`` header.
+
+    Raises:
+        web.HTTPBadRequest: if the ``Accept-Encoding:`` header is malformed.
+
+    """
+    if hdrs.ACCEPT_ENCODING not in request.headers:
+        return _content_coding.IDENTITY
+    return matcher.best_match(
+        ','.join(request.headers.getall(hdrs.ACCEPT_ENCODING))
     )
 
 
+def _add_vary(headers, header_name: str):
+    # language=rst
+    """Adds ``header_name`` to the ``Vary:`` header in ``headers``, if necessary."""
+    vary = headers.get(hdrs.VARY)
+    if vary is None:
+        headers[hdrs.VARY] = header_name
+        return
+    present = {v.strip().lower() for v in vary.split(',')}
+    if '*' not in present and header_name.lower() not in present:
+        headers[hdrs.VARY] = vary + ', ' + header_name
+
+
 def produces_content_types(*content_types):
     # language=rst
     """Decorator for :class:`View <aiohttp.web.View>` request handler methods.
 
     This method sets ``self.request['best_content_type']`` to one of the
-    provided content types.
+    provided content types, taking q-values and media type parameters in the
+    ``Accept:`` request header into account.  The provided content types are
+    parsed only once, when the decorator is applied.
 
     Parameters:
         content_types: all content types this handler can produce, best quality
@@ -104,13 +354,60 @@ def produces_content_types(*content_types):
     """
     if len(content_types) == 1 and not isinstance(content_types[0], str):
         content_types = content_types[0]
+    matcher = _ContentTypeMatcher(content_types)
 
     def decorator(f: T.Callable):
         @functools.wraps(f)
         async def wrapper(self, *args, **kwargs):
             request = self.request
             request['best_content_type'] = \
-                _best_content_type(request, content_types)
+                _best_content_type(request, matcher)
+            return await f(self, *args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def produces_content_encodings(*content_encodings):
+    # language=rst
+    """Decorator for :class:`View <aiohttp.web.View>` request handler methods.
+
+    This method sets ``self.request['best_content_encoding']`` to one of the
+    provided content codings, or to ``'identity'``.
+
+    Parameters:
+        content_encodings: all content codings this handler can produce, best
+            first.  Defaults to all codings in
+            :const:`~aiohttp_extras._content_coding.AVAILABLE_CONTENT_ENCODINGS`.
+
+    Example::
+
+        class MyView(aiohttp.web.View):
+            @produces_content_encodings('gzip')
+            async def get(self):
+                body = ...
+                encoding = self.request['best_content_encoding']
+                response = aiohttp.web.Response(
+                    body=_content_coding.compress(body, encoding, level=9)
+                )
+                _add_vary(response.headers, 'Accept-Encoding')
+                if encoding != 'identity':
+                    response.headers['Content-Encoding'] = encoding
+                return response
+
+    """
+    if len(content_encodings) == 1 and not isinstance(content_encodings[0], str):
+        content_encodings = content_encodings[0]
+    matcher = _ContentEncodingMatcher(
+        content_encodings or _content_coding.AVAILABLE_CONTENT_ENCODINGS
+    )
+
+    def decorator(f: T.Callable):
+        @functools.wraps(f)
+        async def wrapper(self, *args, **kwargs):
+            request = self.request
+            request['best_content_encoding'] = \
+                _best_content_encoding(request, matcher)
             return await f(self, *args, **kwargs)
         return wrapper
 
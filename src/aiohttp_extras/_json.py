@@ -114,6 +114,7 @@ The public interface of this module consists of:
 
 """
 
+import asyncio
 import re
 import logging
 import inspect
@@ -158,6 +159,7 @@ Warning:
 
 """
 _JSON_DEFAULT_CHUNK_SIZE = 1024 * 1024
+_DEFAULT_MAX_CONCURRENCY = 8
 _INFINITY = float('inf')
 
 _ESCAPE = re.compile(r'[\x00-\x1f\\"\b\f\n\r\t]')
@@ -204,66 +206,120 @@ def _encode_float(o, allow_nan=False):
     return text
 
 
-async def _encode_list(obj, stack):
-    if id(obj) in stack:
-        raise ValueError("Cannot serialize cyclic data structure.")
-    stack.add(id(obj))
+class _Limiter:
+    # language=rst
+    """Limits the number of views resolved concurrently by one :func:`encode`."""
+    __slots__ = ('semaphore', 'window')
+
+    def __init__(self, max_concurrency: int):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.window = max_concurrency
+
+
+async def _iterate(obj):
+    for item in obj:
+        yield item
+
+
+async def _once(obj):
+    yield obj
+
+
+async def _view_to_dict(view, limiter: '_Limiter') -> dict:
     try:
-        first = True
-        is_dict = False
-        for item in obj:
-            if first:
-                if item is IM_A_DICT:
-                    is_dict = True
-                    continue
-                yield '{' if is_dict else '['
-                first = False
-            else:
-                yield ','
-            if is_dict:
-                if not isinstance(item[0], str):
-                    message = "Dictionary key is not a string: '%r'"
-                    raise ValueError(message % item[0])
-                yield _encode_string(item[0]) + ':'
-                async for s in _encode(item[1], stack):
-                    yield s
-            else:
-                async for s in _encode(item, stack):
-                    yield s
-        if first:
-            yield '{}' if is_dict else '[]'
-        else:
-            yield '}' if is_dict else ']'
+        async with limiter.semaphore:
+            return await view.to_dict()
+    except web.HTTPException as e:
+        _logger.error("Unexpected exception", exc_info=e, stack_info=True)
+        result = {
+            '_links': {'self': {'href': view.canonical_rel_url}},
+            '_status': e.status_code
+        }
+        if e.text is not None:
+            result['description'] = e.text
+        return result
+
+
+async def _resolve_views(items: T.AsyncIterator, limiter: '_Limiter') \
+        -> T.AsyncIterator[list]:
+    # language=rst
+    """Yields ``items`` in runs, with views replaced by their ``to_dict()``.
+
+    Views are resolved concurrently, up to ``limiter.window`` items ahead of
+    the item being yielded, so that an array of embedded views doesn't take as
+    many sequential round-trips to the database.  Items are yielded in their
+    original order, in lists of consecutive items that are ready.
+
+    """
+    pending = collections.deque()
+    try:
+        async for item in items:
+            if isinstance(item, _view.View):
+                item = asyncio.ensure_future(_view_to_dict(item, limiter))
+            pending.append(item)
+            run = []
+            while len(pending) >= limiter.window or len(pending) > 0 and \
+                    not isinstance(pending[0], asyncio.Future):
+                item = pending.popleft()
+                run.append((await item) if isinstance(item, asyncio.Future) else item)
+            if len(run) > 0:
+                yield run
+        run = []
+        while len(pending) > 0:
+            item = pending.popleft()
+            run.append((await item) if isinstance(item, asyncio.Future) else item)
+        if len(run) > 0:
+            yield run
     finally:
-        stack.remove(id(obj))
+        for item in pending:
+            if isinstance(item, asyncio.Future):
+                item.cancel()
+                # Avoid "Task exception was never retrieved":
+                item.add_done_callback(
+                    lambda t: t.cancelled() or t.exception()
+                )
 
 
-async def _encode_async_generator(obj, stack):
+async def _encode_items(obj, runs: T.AsyncIterable[T.Sequence], stack, limiter):
+    # language=rst
+    """Encodes the items of ``obj`` as a JSON array.
+
+    Or as a JSON object, if the first item is :const:`IM_A_DICT`.
+
+    Parameters:
+        obj: the iterable whose items are encoded, for cycle detection.
+        runs: the (resolved) items of ``obj``, in consecutive sequences.
+            Iterating runs of items, rather than single items, saves the
+            overhead of an asynchronous iteration per item; plain sequences
+            are passed as a single run.
+
+    """
     if id(obj) in stack:
         raise ValueError("Cannot serialize cyclic data structure.")
     stack.add(id(obj))
     try:
         first = True
         is_dict = False
-        async for item in obj:
-            if first:
-                if item is IM_A_DICT:
-                    is_dict = True
-                    continue
-                yield '{' if is_dict else '['
-                first = False
-            else:
-                yield ','
-            if is_dict:
-                if not isinstance(item[0], str):
-                    message = "Dictionary key is not a string: '%r'"
-                    raise ValueError(message % repr(item[0]))
-                yield _encode_string(item[0]) + ':'
-                async for s in _encode(item[1], stack):
-                    yield s
-            else:
-                async for s in _encode(item, stack):
-                    yield s
+        async for run in runs:
+            for item in run:
+                if first:
+                    if item is IM_A_DICT:
+                        is_dict = True
+                        continue
+                    yield '{' if is_dict else '['
+                    first = False
+                else:
+                    yield ','
+                if is_dict:
+                    if not isinstance(item[0], str):
+                        message = "Dictionary key is not a string: '%r'"
+                        raise ValueError(message % (item[0],))
+                    yield _encode_string(item[0]) + ':'
+                    async for s in _encode(item[1], stack, limiter):
+                        yield s
+                else:
+                    async for s in _encode(item, stack, limiter):
+                        yield s
         if first:
             yield '{}' if is_dict else '[]'
         else:
@@ -272,7 +328,7 @@ async def _encode_async_generator(obj, stack):
         stack.remove(id(obj))
 
 
-async def _encode_dict(obj, stack):
+async def _encode_dict(obj, stack, limiter):
     if id(obj) in stack:
         raise ValueError("Cannot serialize cyclic data structure.")
     stack.add(id(obj))
@@ -287,7 +343,7 @@ async def _encode_dict(obj, stack):
                 first = False
             else:
                 yield ',' + _encode_string(key) + ':'
-            async for s in _encode(value, stack):
+            async for s in _encode(value, stack, limiter):
                 yield s
         if first:
             yield '{}'
@@ -297,21 +353,13 @@ async def _encode_dict(obj, stack):
         stack.remove(id(obj))
 
 
-async def _encode(obj: T.Any, stack: T.Set) -> T.Union[str, T.Any]:
+async def _encode(obj: T.Any, stack: T.Set,
+                  limiter: '_Limiter') -> T.Union[str, T.Any]:
     if isinstance(obj, URL):
         yield _encode_string(str(obj))
     elif isinstance(obj, _view.View):
-        try:
-            obj = await obj.to_dict()
-        except web.HTTPException as e:
-            _logger.error("Unexpected exception", exc_info=e, stack_info=True)
-            obj = {
-                '_links': {'self': {'href': obj.canonical_rel_url}},
-                '_status': e.status_code
-            }
-            if e.text is not None:
-                obj['description'] = e.text
-        async for s in _encode_dict(obj, stack):
+        obj = await _view_to_dict(obj, limiter)
+        async for s in _encode_dict(obj, stack, limiter):
             yield s
     elif isinstance(obj, str):
         yield _encode_string(obj)
@@ -326,13 +374,23 @@ async def _encode(obj: T.Any, stack: T.Set) -> T.Union[str, T.Any]:
     elif isinstance(obj, int):
         yield str(obj)
     elif isinstance(obj, collections.abc.Mapping):
-        async for s in _encode_dict(obj, stack):
+        async for s in _encode_dict(obj, stack, limiter):
             yield s
     elif isinstance(obj, collections.abc.Iterable):
-        async for s in _encode_list(obj, stack):
+        # Lists and tuples without views, by far the most common case, skip
+        # the overhead of _resolve_views().  View is an ABC, so checking the
+        # type of each item, rather than calling isinstance() on each item, is
+        # much faster:
+        if isinstance(obj, (list, tuple)) and not any(
+                issubclass(t, _view.View) for t in set(map(type, obj))):
+            runs = _once(obj)
+        else:
+            runs = _resolve_views(_iterate(obj), limiter)
+        async for s in _encode_items(obj, runs, stack, limiter):
             yield s
     elif inspect.isasyncgen(obj):
-        async for s in _encode_async_generator(obj, stack):
+        runs = _resolve_views(obj, limiter)
+        async for s in _encode_items(obj, runs, stack, limiter):
             yield s
     elif hasattr(obj, '__str__'):
         message = "Not sure how to serialize object of class %s:\n" \
@@ -346,12 +404,25 @@ async def _encode(obj: T.Any, stack: T.Set) -> T.Union[str, T.Any]:
         yield 'null'
 
 
-async def encode(obj, chunk_size=_JSON_DEFAULT_CHUNK_SIZE) -> \
+async def encode(obj, chunk_size=_JSON_DEFAULT_CHUNK_SIZE,
+                 max_concurrency=_DEFAULT_MAX_CONCURRENCY) -> \
         collections.AsyncIterable:
     # language=rst
-    """Asynchronous JSON serializer."""
+    """Asynchronous JSON serializer.
+
+    Parameters:
+        obj: the object to serialize.
+        chunk_size: the size of the yielded chunks, except the last one.
+        max_concurrency: the maximum number of
+            :class:`~aiohttp_extras.View`\\s whose :attr:`to_dict
+            <aiohttp_extras.View.to_dict>` is awaited concurrently.  Views in
+            arrays are resolved ahead of serialization, but serialized in
+            their original order.
+
+    """
+    limiter = _Limiter(max_concurrency)
     buffer = bytearray()
-    async for b in _encode(obj, set()):
+    async for b in _encode(obj, set(), limiter):
         buffer += b.encode()
         while len(buffer) >= chunk_size:
             yield buffer[:chunk_size]
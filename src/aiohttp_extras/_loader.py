@@ -0,0 +1,121 @@
+# language=rst
+"""
+
+Batched loading of the data behind many views ("DataLoader").
+
+A collection that embeds its members would normally call every member's
+:attr:`~aiohttp_extras.View.to_dict`, and each of these typically runs a
+database query of its own: one query for the collection, plus *N* for its
+members.  Views can instead implement the class method
+:attr:`View.batch_load <aiohttp_extras.View.batch_load>`, and obtain their
+data through :meth:`View.batch_loaded() <aiohttp_extras.View.batch_loaded>`.
+All keys requested within the same iteration of the event loop, for the same
+view class and the same request, are then loaded in a single call.
+
+Example::
+
+    class Member(aiohttp_extras.View):
+
+        @classmethod
+        async def batch_load(cls, request, keys):
+            rows = await request.app['db'].fetch(
+                'SELECT * FROM members WHERE id = ANY($1)', keys
+            )
+            return {row['id']: row for row in rows}
+
+        async def to_dict(self):
+            return dict(await self.batch_loaded())
+
+:class:`~aiohttp_extras.serializers.hal_json.HALJSONMixin` *primes* the keys of
+all embedded views before any of them is serialized, so that even a large
+collection is loaded in a single call.
+
+"""
+import asyncio
+import typing as T
+
+from aiohttp import web
+
+_LOADERS = 'aiohttp_extras.loaders'
+
+
+class BatchLoader:
+    # language=rst
+    """Loads the data of one view class, for one request, in batches.
+
+    Each key is loaded at most once per request.  Use :func:`batch_loader` to
+    obtain the loader for a view class.
+
+    """
+
+    def __init__(self, view_class, request: web.Request):
+        self._view_class = view_class
+        self._request = request
+        self._futures = {}
+        self._queue = []
+
+    def prime(self, key: T.Hashable) -> asyncio.Future:
+        # language=rst
+        """Schedules ``key`` for loading in the next batch."""
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        # Avoid "Future exception was never retrieved" for unused keys:
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._futures[key] = future
+        if len(self._queue) == 0:
+            loop.call_soon(self._dispatch)
+        self._queue.append(key)
+        return future
+
+    def load(self, key: T.Hashable) -> T.Awaitable:
+        # language=rst
+        """The data for ``key``, loaded together with all other queued keys.
+
+        Raises:
+            web.HTTPNotFound: if :attr:`View.batch_load
+                <aiohttp_extras.View.batch_load>` returned no data for
+                ``key``.
+
+        """
+        # Cancelling one caller mustn't cancel the others waiting for this key:
+        return asyncio.shield(self.prime(key))
+
+    def _dispatch(self):
+        keys, self._queue = self._queue, []
+        asyncio.ensure_future(self._load(keys))
+
+    async def _load(self, keys: T.List[T.Hashable]):
+        futures = [self._futures[key] for key in keys]
+        try:
+            results = await self._view_class.batch_load(self._request, keys)
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in zip(keys, futures):
+            if future.done():
+                continue
+            if key in results:
+                future.set_result(results[key])
+            else:
+                future.set_exception(web.HTTPNotFound())
+
+
+def batch_loader(request: web.Request, view_class) -> BatchLoader:
+    # language=rst
+    """The :class:`BatchLoader` for ``view_class`` in ``request``."""
+    loaders = request.get(_LOADERS)
+    if loaders is None:
+        loaders = request[_LOADERS] = {}
+    loader = loaders.get(view_class)
+    if loader is None:
+        loader = loaders[view_class] = BatchLoader(view_class, request)
+    return loader
@@ -0,0 +1,280 @@
+# language=rst
+"""
+
+Keyset ("cursor") pagination for collection views.
+
+Offset pagination (``LIMIT n OFFSET m``) makes the database skip ``m`` rows for
+every page, so it gets slower the deeper a client pages.  *Keyset* pagination
+instead remembers the sort key of the last item on a page, and asks for the
+items *after* that key (``WHERE key > $1 ORDER BY key LIMIT n``).  With an index
+on the sort key, every page costs the same.
+
+The sort key is passed to clients as an opaque *cursor*, in the ``next`` and
+``prev`` links of each page.  Clients must not construct cursors themselves.
+
+Example::
+
+    class Members(KeysetPaginationMixin, aiohttp_extras.View):
+
+        async def fetch_page(self, after, before, limit):
+            if before is None:
+                return await db.fetch(
+                    'SELECT * FROM members WHERE id > $1 ORDER BY id LIMIT $2',
+                    after[0] if after else '', limit
+                )
+            rows = await db.fetch(
+                'SELECT * FROM members WHERE id < $1 ORDER BY id DESC LIMIT $2',
+                before[0], limit
+            )
+            return rows[::-1]
+
+        def cursor_key(self, item):
+            return [item['id']]
+
+"""
+import abc
+import asyncio
+import base64
+import binascii
+import collections
+import json
+import logging
+import time
+import typing as T
+
+from aiohttp import web, hdrs
+
+_logger = logging.getLogger(__name__)
+
+_NEXT = 'n'
+_PREV = 'p'
+_PREFETCH_CACHE_SIZE = 64
+
+
+def encode_cursor(direction: str, key: T.Sequence) -> str:
+    # language=rst
+    """Encodes a sort key and paging direction into an opaque cursor.
+
+    Parameters:
+        direction: either ``'n'`` (items after ``key``) or ``'p'`` (items
+            before ``key``).
+        key: the sort key; a sequence of JSON serializable values.
+
+    """
+    data = json.dumps([direction, list(key)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: str) -> T.Tuple[str, list]:
+    # language=rst
+    """Inverse of :func:`encode_cursor`.
+
+    Raises:
+        web.HTTPBadRequest: if ``cursor`` is malformed.
+
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, key = json.loads(data.decode())
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise web.HTTPBadRequest(text="Malformed cursor") from None
+    if direction not in (_NEXT, _PREV) or not isinstance(key, list):
+        raise web.HTTPBadRequest(text="Malformed cursor")
+    return direction, key
+
+
+class Page:
+    # language=rst
+    """One page of a paginated collection.
+
+    Attributes:
+        items (list): the items on this page.
+        links (dict): HAL-style link objects ``self``, and ``next`` and
+            ``prev`` if there are more items in those directions.
+
+    """
+    __slots__ = ('items', 'links')
+
+    def __init__(self, items: T.List, links: T.Dict[str, T.Dict[str, str]]):
+        self.items = items
+        self.links = links
+
+
+class KeysetPaginationMixin(abc.ABC):
+    # language=rst
+    """Adds keyset pagination to a :class:`~aiohttp_extras.View`.
+
+    Users of this mixin *must* implement abstract methods :meth:`fetch_page`
+    and :meth:`cursor_key`.
+
+    """
+
+    page_size = 100
+    # language=rst
+    """Number of items per page if the request has no ``page_size`` parameter."""
+
+    max_page_size = 1000
+    # language=rst
+    """Maximum value of the ``page_size`` query parameter."""
+
+    prefetch_next_page = False
+    # language=rst
+    """Whether to fetch the next page while the current page is being sent.
+
+    The prefetched page is kept for at most :attr:`prefetch_ttl` seconds, and
+    only served to a request for exactly the ``next`` link, with the same
+    ``Authorization:`` header.  Only enable this if such slightly stale pages
+    are acceptable.
+
+    The next page is fetched in a background task, which usually outlives the
+    request that started it; see :meth:`fetch_page`.
+
+    """
+
+    prefetch_ttl = 5.0
+
+    @abc.abstractmethod
+    async def fetch_page(self, after: T.Optional[list],
+                         before: T.Optional[list], limit: int) -> T.Sequence:
+        # language=rst
+        """Fetches at most ``limit`` items, in ascending order of their key.
+
+        With :attr:`prefetch_next_page`, this method is also called to
+        prefetch the next page, in a background task that may still run after
+        the response was sent.  It must therefore depend on nothing but its
+        arguments and application-wide state (such as a database pool in
+        ``self.request.app``); not on the request body, or on connections or
+        other resources that are released at the end of the request.
+
+        Parameters:
+            after: if not ``None``, the first ``limit`` items with a key greater
+                than ``after``.
+            before: if not ``None``, the *last* ``limit`` items with a key less
+                than ``before``.  Never set together with ``after``.
+            limit: the maximum number of items to return.
+
+        """
+
+    @abc.abstractmethod
+    def cursor_key(self, item) -> T.Sequence:
+        # language=rst
+        """The sort key of ``item``, as a sequence of JSON serializable values."""
+
+    def _prefetched(self) -> collections.OrderedDict:
+        # language=rst
+        """The prefetched pages of this view class, in the current application.
+
+        Maps :meth:`_prefetch_key`\\s to ``(expires, task)`` tuples, oldest
+        first.  Prefetched pages are kept per application, because their tasks
+        belong to the event loop of the application.
+
+        """
+        app = self.request.app
+        prefetched = getattr(app, 'rest_utils_prefetched', None)
+        if prefetched is None:
+            prefetched = app.rest_utils_prefetched = {}
+        result = prefetched.get(type(self))
+        if result is None:
+            result = prefetched[type(self)] = collections.OrderedDict()
+        return result
+
+    def _page_size(self) -> int:
+        page_size = self.query.get('page_size')
+        if page_size is None:
+            return self.page_size
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            raise web.HTTPBadRequest(text="Malformed page_size parameter") from None
+        if not 0 < page_size <= self.max_page_size:
+            raise web.HTTPBadRequest(
+                text="page_size must be between 1 and %d" % self.max_page_size
+            )
+        return page_size
+
+    def _prefetch_key(self, rel_url: web.URL):
+        return str(rel_url), self.request.headers.get(hdrs.AUTHORIZATION)
+
+    async def _fetch(self, after, before, limit):
+        prefetched = self._prefetched().pop(
+            self._prefetch_key(self.canonical_rel_url), None
+        )
+        if prefetched is not None:
+            expires, task = prefetched
+            if time.monotonic() < expires:
+                try:
+                    return await asyncio.shield(task)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    _logger.exception("Prefetching page failed.")
+            else:
+                task.cancel()
+        return await self.fetch_page(after, before, limit)
+
+    def _prefetch(self, rel_url: web.URL, after, limit):
+        prefetched = self._prefetched()
+        now = time.monotonic()
+        key = self._prefetch_key(rel_url)
+        previous = prefetched.get(key)
+        if previous is not None:
+            if previous[0] > now:
+                # Still fresh, or still being fetched; don't fetch it again:
+                return
+            del prefetched[key]
+            previous[1].cancel()
+        while len(prefetched) > 0 and (
+            len(prefetched) >= _PREFETCH_CACHE_SIZE or
+            next(iter(prefetched.values()))[0] <= now
+        ):
+            _, task = prefetched.popitem(last=False)[1]
+            task.cancel()
+        task = asyncio.ensure_future(self.fetch_page(after, None, limit))
+        # Avoid "Task exception was never retrieved" for unused prefetches:
+        task.add_done_callback(
+            lambda t: t.cancelled() or t.exception()
+        )
+        prefetched[key] = (now + self.prefetch_ttl, task)
+
+    async def page(self) -> Page:
+        # language=rst
+        """The page requested by the ``cursor`` and ``page_size`` parameters.
+
+        Raises:
+            web.HTTPBadRequest: if the cursor or page size is malformed.
+
+        """
+        limit = self._page_size()
+        cursor = self.query.get('cursor')
+        direction, key = (_NEXT, None) if cursor is None else decode_cursor(cursor)
+        # One extra item tells whether there are more items in this direction:
+        if direction == _NEXT:
+            items = list(await self._fetch(key, None, limit + 1))
+            has_next = len(items) > limit
+            has_prev = key is not None
+            del items[limit:]
+        else:
+            items = list(await self._fetch(None, key, limit + 1))
+            has_prev = len(items) > limit
+            has_next = True
+            del items[:-limit]
+        rel_url = self.canonical_rel_url
+        links = {'self': {'href': str(rel_url)}}
+        if len(items) > 0:
+            if has_next:
+                next_key = list(self.cursor_key(items[-1]))
+                next_url = rel_url.update_query(
+                    cursor=encode_cursor(_NEXT, next_key)
+                )
+                links['next'] = {'href': str(next_url)}
+                if self.prefetch_next_page:
+                    self._prefetch(next_url, next_key, limit + 1)
+            if has_prev:
+                links['prev'] = {'href': str(rel_url.update_query(
+                    cursor=encode_cursor(_PREV, self.cursor_key(items[0]))
+                ))}
+        return Page(items, links)
+
+    async def to_dict(self):
+        page = await self.page()
+        return {'_links': page.links, 'items': page.items}
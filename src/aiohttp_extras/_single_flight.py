@@ -0,0 +1,203 @@
+# language=rst
+"""
+
+Request coalescing ("single-flight") for streamed response bodies.
+
+When many clients request the same resource at the same time, for example
+right after it has changed, each request would normally generate and encode
+the very same response body.  A :class:`SingleFlight` table lets concurrent
+requests with the same key share one generation: the first request starts it,
+and every subscriber receives the same chunks, in order.
+
+A generation remains *joinable* for as long as all chunks produced so far fit
+in a bounded replay buffer.  Late joiners first catch up from that buffer.
+Once the buffer overflows, the generation is removed from the table, and new
+requests with the same key start a generation of their own.
+
+The generation waits for the slowest subscriber, so that a slow client can't
+make the buffer grow without bounds.
+
+"""
+import asyncio
+import typing as T
+
+_MAX_LAG = 16
+# language=rst
+"""Maximum number of chunks a generation runs ahead of its slowest subscriber."""
+
+
+class _Flight:
+    # language=rst
+    """A single generation of chunks, shared by one or more subscribers."""
+
+    def __init__(self, table: 'SingleFlight', key: T.Hashable,
+                 generate: T.Callable[[], T.Awaitable[T.AsyncIterable[bytes]]]):
+        self._table = table
+        self._key = key
+        self._loop = asyncio.get_event_loop()
+        self._waiter = self._loop.create_future()
+        self._chunks = []
+        self._offset = 0
+        self._produced = 0
+        self._positions = {}
+        self._done = False
+        self._error = None
+        self.joinable = True
+        self._task = asyncio.ensure_future(self._run(generate))
+
+    def _notify(self):
+        waiter, self._waiter = self._waiter, self._loop.create_future()
+        if not waiter.done():
+            waiter.set_result(None)
+
+    async def _wait(self, predicate: T.Callable[[], bool]):
+        # The waiter is shared, so a cancelled subscriber mustn't cancel it:
+        while not predicate():
+            await asyncio.shield(self._waiter)
+
+    @property
+    def _end(self) -> int:
+        return self._offset + len(self._chunks)
+
+    def _caught_up(self) -> bool:
+        return len(self._positions) == 0 or \
+            min(self._positions.values()) >= self._end - _MAX_LAG
+
+    def _close(self):
+        # language=rst
+        """Makes this flight unjoinable, and drops chunks nobody needs anymore."""
+        if self.joinable:
+            self.joinable = False
+            self._table._remove(self._key, self)
+        if len(self._positions) == 0:
+            consumed = self._end
+        else:
+            consumed = min(self._positions.values())
+        del self._chunks[:consumed - self._offset]
+        self._offset = consumed
+
+    async def _run(self, generate):
+        try:
+            async for chunk in await generate():
+                chunk = bytes(chunk)
+                self._chunks.append(chunk)
+                self._produced += len(chunk)
+                if not self.joinable or \
+                        self._produced > self._table.replay_limit:
+                    self._close()
+                self._notify()
+                await self._wait(self._caught_up)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._close()
+            self._notify()
+
+    def subscribe(self) -> '_Subscription':
+        assert self.joinable
+        return _Subscription(self)
+
+
+class _Subscription:
+    # language=rst
+    """Asynchronous iterator over the chunks of a :class:`_Flight`.
+
+    Subscribers must call :meth:`close` when they stop iterating, whether they
+    consumed all chunks or not.
+
+    """
+    def __init__(self, flight: _Flight):
+        self._flight = flight
+        flight._positions[self] = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        flight = self._flight
+        if flight is None:
+            raise StopAsyncIteration()
+        await flight._wait(
+            lambda: flight._positions[self] < flight._end or flight._done
+        )
+        position = flight._positions[self]
+        if position < flight._end:
+            chunk = flight._chunks[position - flight._offset]
+            flight._positions[self] = position + 1
+            if not flight.joinable:
+                flight._close()
+            flight._notify()
+            return chunk
+        if flight._error is not None:
+            raise flight._error
+        raise StopAsyncIteration()
+
+    def close(self):
+        flight, self._flight = self._flight, None
+        if flight is None:
+            return
+        del flight._positions[self]
+        if len(flight._positions) == 0 and not flight._done:
+            # Nobody is interested in the result anymore:
+            flight._task.cancel()
+        if not flight.joinable:
+            flight._close()
+        flight._notify()
+
+
+class SingleFlight:
+    # language=rst
+    """Table of in-flight generations, keyed by request.
+
+    Parameters:
+        replay_limit: maximum number of bytes a generation may have produced
+            for new subscribers to still join it.
+
+    Example::
+
+        single_flight = SingleFlight()
+
+        async def handler(request):
+            chunks = single_flight.subscribe(
+                request.rel_url.raw_path_qs, lambda: generate_body(request)
+            )
+            try:
+                async for chunk in chunks:
+                    ...
+            finally:
+                chunks.close()
+
+    """
+    def __init__(self, replay_limit: int=1024 * 1024):
+        self.replay_limit = replay_limit
+        self._flights = {}
+
+    def _remove(self, key: T.Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def subscribe(self, key: T.Hashable,
+                  generate: T.Callable[[], T.Awaitable[T.AsyncIterable[bytes]]]) \
+            -> _Subscription:
+        # language=rst
+        """Subscribes to the generation for ``key``, starting it if necessary.
+
+        Parameters:
+            key: identifies the response body; requests with equal keys must
+                produce identical bodies.
+            generate: coroutine function that starts a new generation; only
+                called if there's no joinable generation for ``key``.
+
+        Returns:
+            An asynchronous iterator over the chunks of the generation, with a
+            method ``close()`` which must be called when done.
+
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(self, key, generate)
+            self._flights[key] = flight
+        return flight.subscribe()
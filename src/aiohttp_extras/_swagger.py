@@ -1,11 +1,407 @@
-import typing as T
+# language=rst
+"""
+
+Access to the OpenAPI (swagger) definition of an application.
+
+:func:`swaggerize` parses the definition once, at startup, and compiles it into
+a :class:`SwaggerIndex`: a trie of all paths in the definition, with
+precomputed metadata for every operation.  Looking up the operation of a
+request then costs time proportional to the number of path segments, instead
+of a regular expression match against every path in the definition, as with
+:meth:`swagger_parser.SwaggerParser.get_path_spec`.
+
+Example::
+
+    swaggerize(app, 'openapi.yml')
+
+    async def handler(request):
+        operation = request_operation(request)
+        if operation is not None and operation.security is not None:
+            ...
+
+Parsing a large definition takes seconds, which every pre-forked worker pays
+on every start.  With a ``cache_path``, :func:`swaggerize` stores the parsed
+definition in a cache file, keyed by a hash of the definition and of the
+:mod:`swagger_parser` version, and later starts load it from there::
+
+    swaggerize(app, 'openapi.yml', cache_path='/var/cache/myapp/openapi.pickle')
+
+"""
+import hashlib
+import json
+import logging
 import os
+import pickle
+import re
+import tempfile
+import types
+import typing as T
 
-from aiohttp import web
+from aiohttp import web, hdrs
 import swagger_parser
 
+from . import _validation
+
+_logger = logging.getLogger(__name__)
+
 _SWAGGER_SYMBOL = 'aiohttp_extras.swagger_definition'
+_SWAGGER_INDEX_SYMBOL = 'aiohttp_extras.swagger_index'
+_OPERATION_SYMBOL = 'aiohttp_extras.swagger_operation'
+
+_TEMPLATE_PATTERN = re.compile(r'\{[^{}/]+\}')
+_HTTP_METHODS = ('get', 'put', 'post', 'delete', 'options', 'head', 'patch')
+_NOT_FOUND = object()
+_CACHE_FORMAT = b'aiohttp_extras.swagger_cache.1'
+
+
+def _default_to_str(value) -> str:
+    # language=rst
+    """Formats a parameter default the way it would appear in a query string."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+class Operation:
+    # language=rst
+    """Precomputed metadata of a single operation in the definition.
+
+    All attributes are read-only.
+
+    Attributes:
+        path (str): the templated path, including the base path.
+        method (str): the lowercase HTTP method.
+        operation_id (str): the ``operationId``, if any.
+        parameters (~types.MappingProxyType): parameter objects by name,
+            including path-level parameters, with ``$ref``\\s resolved.
+        defaults (~types.MappingProxyType): the default values of query
+            parameters, as strings.
+        security (tuple): the applicable security requirements, or ``None``.
+        responses (~types.MappingProxyType): response objects by status code.
+        consumes (tuple): the media types this operation consumes, if
+            specified.
+        response_schemas (~types.MappingProxyType): the response schemas,
+            compiled for streaming validation, by status code.  See
+            :class:`~aiohttp_extras._validation.StreamValidator`.
+        validate_request: coroutine function that raises
+            :exc:`aiohttp.web.HTTPBadRequest` for invalid requests, or
+            ``None`` if the operation has no parameters to validate.  See
+            :func:`~aiohttp_extras._validation.compile_request_validator`.
+
+    """
+    __slots__ = ('path', 'method', 'operation_id', 'parameters', 'defaults',
+                 'security', 'responses', 'consumes', 'spec',
+                 'response_schemas', 'validate_request')
+
+    def __init__(self, path: str, method: str, spec: T.Mapping[str, T.Any],
+                 parameters: T.Mapping[str, T.Mapping[str, T.Any]],
+                 global_security: T.Optional[T.List]=None,
+                 compiler: T.Optional[_validation.SchemaCompiler]=None):
+        self.path = path
+        self.method = method
+        self.spec = spec
+        self.operation_id = spec.get('operationId')
+        self.parameters = types.MappingProxyType(dict(parameters))
+        self.defaults = types.MappingProxyType({
+            name: _default_to_str(parameter['default'])
+            for name, parameter in parameters.items()
+            if parameter.get('in') == 'query' and 'default' in parameter
+        })
+        security = spec.get('security', global_security)
+        self.security = None if security is None else tuple(security)
+        self.responses = types.MappingProxyType({
+            str(status): response
+            for status, response in spec.get('responses', {}).items()
+        })
+        consumes = spec.get('consumes')
+        self.consumes = None if consumes is None else tuple(consumes)
+        self.response_schemas = types.MappingProxyType({} if compiler is None else {
+            status: compiler.compile_node(response['schema'])
+            for status, response in self.responses.items()
+            if 'schema' in response
+        })
+        self.validate_request = None if compiler is None \
+            else _validation.compile_request_validator(self.parameters, compiler)
+
+    def __repr__(self):
+        return '<Operation %s %s>' % (self.method.upper(), self.path)
+
+
+class PathItem:
+    # language=rst
+    """All operations on a single templated path.
+
+    The responses to ``OPTIONS`` requests, and the ``Allow:`` header of
+    ``405 Method Not Allowed`` responses, are computed here once, at startup.
+
+    Attributes:
+        path (str): the templated path, including the base path.
+        operations (~types.MappingProxyType): :class:`Operation`\\s by lowercase
+            HTTP method.
+        allowed_methods (frozenset): uppercase HTTP methods allowed on this
+            path, including ``HEAD`` if ``GET`` is allowed, and ``OPTIONS``.
+        options_body (bytes): JSON object with the operation objects of this
+            path, by lowercase HTTP method.
+        options_headers (~types.MappingProxyType): headers of the response to
+            an ``OPTIONS`` request.
+
+    """
+    __slots__ = ('path', 'operations', 'allowed_methods', 'options_body',
+                 'options_headers')
+
+    def __init__(self, path: str, operations: T.Dict[str, Operation]):
+        self.path = path
+        self.operations = types.MappingProxyType(operations)
+        allowed_methods = {method.upper() for method in operations}
+        allowed_methods.add(hdrs.METH_OPTIONS)
+        if hdrs.METH_GET in allowed_methods:
+            allowed_methods.add(hdrs.METH_HEAD)
+        self.allowed_methods = frozenset(allowed_methods)
+        self.options_body = json.dumps(
+            {method: operation.spec for method, operation in operations.items()},
+            default=str, separators=(',', ':'), sort_keys=True
+        ).encode()
+        self.options_headers = types.MappingProxyType({
+            hdrs.ALLOW: ','.join(sorted(allowed_methods)),
+            hdrs.CONTENT_TYPE: 'application/json; charset=utf-8',
+        })
+
+    def operation(self, method: str) -> T.Optional[Operation]:
+        # language=rst
+        """The operation for HTTP method ``method``.
+
+        ``HEAD`` requests are handled by the ``GET`` operation, unless the
+        definition has an explicit ``head`` operation.
+
+        """
+        method = method.lower()
+        result = self.operations.get(method)
+        if result is None and method == 'head':
+            result = self.operations.get('get')
+        return result
+
+
+class _TrieNode:
+    __slots__ = ('static', 'patterns', 'wildcard', 'path_item')
+
+    def __init__(self):
+        self.static = {}
+        self.patterns = []
+        self.wildcard = None
+        self.path_item = None
+
+
+class SwaggerIndex:
+    # language=rst
+    """Compiled index of all paths and operations in an OpenAPI definition.
+
+    Parameters:
+        parser: the parsed definition.
+
+    """
+    def __init__(self, parser: swagger_parser.SwaggerParser):
+        self.parser = parser
+        self.base_path = parser.base_path
+        self.path_items = {}
+        self._root = _TrieNode()
+        global_security = parser.specification.get('security')
+        compiler = _validation.SchemaCompiler(
+            parser.specification.get('definitions', {})
+        )
+        for path, path_spec in parser.specification['paths'].items():
+            full_path = parser.base_path + path
+            parsed = parser.paths.get(full_path, {})
+            operations = {
+                method: Operation(
+                    full_path, method, path_spec[method],
+                    parsed.get(method, {}).get('parameters', {}),
+                    global_security, compiler
+                )
+                for method in _HTTP_METHODS if method in path_spec
+            }
+            path_item = PathItem(full_path, operations)
+            self.path_items[full_path] = path_item
+            self._add(full_path, path_item)
+
+    def _add(self, path: str, path_item: PathItem):
+        node = self._root
+        for segment in path.split('/'):
+            if _TEMPLATE_PATTERN.fullmatch(segment):
+                if node.wildcard is None:
+                    node.wildcard = _TrieNode()
+                node = node.wildcard
+            elif _TEMPLATE_PATTERN.search(segment):
+                pattern = re.compile('[^/]+'.join(
+                    re.escape(part) for part in _TEMPLATE_PATTERN.split(segment)
+                ))
+                child = next(
+                    (c for p, c in node.patterns if p.pattern == pattern.pattern),
+                    None
+                )
+                if child is None:
+                    child = _TrieNode()
+                    node.patterns.append((pattern, child))
+                node = child
+            else:
+                node = node.static.setdefault(segment, _TrieNode())
+        node.path_item = path_item
+
+    def _resolve(self, node: _TrieNode, segments: T.List[str], i: int):
+        if i == len(segments):
+            return node.path_item
+        segment = segments[i]
+        child = node.static.get(segment)
+        if child is not None:
+            result = self._resolve(child, segments, i + 1)
+            if result is not None:
+                return result
+        for pattern, child in node.patterns:
+            if pattern.fullmatch(segment):
+                result = self._resolve(child, segments, i + 1)
+                if result is not None:
+                    return result
+        if node.wildcard is not None and len(segment) > 0:
+            return self._resolve(node.wildcard, segments, i + 1)
+        return None
+
+    def resolve(self, raw_path: str) -> T.Optional[PathItem]:
+        # language=rst
+        """The path item matching ``raw_path``, or ``None``.
+
+        Literal path segments take precedence over templated ones.
+
+        """
+        return self._resolve(self._root, raw_path.split('/'), 0)
+
+    def operation(self, raw_path: str, method: str) -> T.Optional[Operation]:
+        # language=rst
+        """The operation for ``method`` on ``raw_path``, or ``None``."""
+        path_item = self.resolve(raw_path)
+        return None if path_item is None else path_item.operation(method)
+
+
+def _swagger_parser_version() -> str:
+    # language=rst
+    """The installed version of :mod:`swagger_parser`, for cache keys.
+
+    Falls back to the modification time of the module file if the version
+    can't be determined, e.g. on Python < 3.8.
+
+    """
+    try:
+        from importlib import metadata
+        return metadata.version('swagger-parser')
+    except ImportError:
+        # Also catches metadata.PackageNotFoundError:
+        return 'mtime:%d' % os.stat(swagger_parser.__file__).st_mtime_ns
+
+
+def _definition_hash(swagger_path: os.PathLike) -> str:
+    h = hashlib.sha256(_CACHE_FORMAT)
+    h.update(_swagger_parser_version().encode())
+    h.update(b'\0')
+    with open(swagger_path, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+def _load_cached_parser(cache_path: os.PathLike, definition_hash: str) \
+        -> T.Optional[swagger_parser.SwaggerParser]:
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_hash, parser = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        _logger.warning("Ignoring unreadable cache file %s", cache_path, exc_info=True)
+        return None
+    if cached_hash != definition_hash:
+        return None
+    return parser
+
+
+def _store_cached_parser(cache_path: os.PathLike, definition_hash: str,
+                         parser: swagger_parser.SwaggerParser):
+    # Write to a temporary file first, so that concurrently starting workers
+    # never see a partially written cache file:
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((definition_hash, parser), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    except OSError:
+        _logger.warning("Couldn't write cache file %s", cache_path, exc_info=True)
+
+
+def swaggerize(app: web.Application, swagger_path: os.PathLike,
+               cache_path: T.Optional[os.PathLike]=None):
+    # language=rst
+    """Parses the definition in ``swagger_path``, and compiles it for ``app``.
+
+    Parameters:
+        app: the application.
+        swagger_path: path of the OpenAPI definition.
+        cache_path: optional path of a cache file for the parsed definition.
+            The cache file is (re)written if it's missing or out of date.  It
+            is unpickled when loaded, so it must not be writable by anyone
+            you don't trust.
+
+    """
+    parser = None
+    if cache_path is not None:
+        definition_hash = _definition_hash(swagger_path)
+        parser = _load_cached_parser(cache_path, definition_hash)
+    if parser is None:
+        parser = swagger_parser.SwaggerParser(swagger_path=swagger_path)
+        if cache_path is not None:
+            _store_cached_parser(cache_path, definition_hash, parser)
+    app[_SWAGGER_SYMBOL] = parser
+    app[_SWAGGER_INDEX_SYMBOL] = SwaggerIndex(parser)
+
+
+def swagger_index(app: web.Application) -> T.Optional[SwaggerIndex]:
+    # language=rst
+    """The :class:`SwaggerIndex` of ``app``, or ``None`` if it wasn't swaggerized."""
+    return app.get(_SWAGGER_INDEX_SYMBOL)
+
+
+def request_operation(request: web.Request) -> T.Optional[Operation]:
+    # language=rst
+    """The operation handling ``request``, or ``None``.
+
+    The result is memoized in the request, so middlewares and handlers can all
+    call this function without repeating the lookup.
+
+    """
+    result = request.get(_OPERATION_SYMBOL, _NOT_FOUND)
+    if result is _NOT_FOUND:
+        index = request.app.get(_SWAGGER_INDEX_SYMBOL)
+        result = None if index is None \
+            else index.operation(request.rel_url.raw_path, request.method)
+        request[_OPERATION_SYMBOL] = result
+    return result
+
+
+@web.middleware
+async def validation_middleware(request: web.Request, handler):
+    # language=rst
+    """Validates requests against the definition before dispatch.
+
+    Uses the validators compiled by :func:`swaggerize`.  Requests for
+    operations that aren't in the definition pass unvalidated.
+
+    Example::
 
+        app = web.Application(middlewares=[validation_middleware])
+        swaggerize(app, 'openapi.yml')
 
-def swaggerize(app: web.Application, swagger_path: os.PathLike):
-    app[_SWAGGER_SYMBOL] = swagger_parser.SwaggerParser(swagger_path=swagger_path)
+    """
+    operation = request_operation(request)
+    if operation is not None and operation.validate_request is not None:
+        await operation.validate_request(request)
+    return await handler(request)
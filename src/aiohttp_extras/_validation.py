@@ -0,0 +1,755 @@
+# language=rst
+"""
+
+Request validation against the OpenAPI definition.
+
+Interpreting JSON schemas for every request is slow.  This module compiles
+each schema once, at startup, into a tree of small Python closures that check
+only what the schema actually specifies.  :func:`compile_request_validator`
+combines the compiled schemas of all parameters of an operation into a single
+validator, which :func:`~aiohttp_extras._swagger.validation_middleware`
+applies before dispatch.
+
+Supported schema keywords are ``$ref``, ``allOf``, ``type``, ``enum``,
+``minimum``, ``maximum``, ``exclusiveMinimum``, ``exclusiveMaximum``,
+``multipleOf``, ``minLength``, ``maxLength``, ``pattern``, ``minItems``,
+``maxItems``, ``items``, ``required``, ``properties`` and
+``additionalProperties``.  Other keywords are ignored.
+
+Responses are validated while they stream: :class:`StreamValidator` tokenizes
+the response body incrementally, chunk by chunk, and checks each value against
+a :class:`SchemaNode` tree as soon as it is complete.  Only the stack of open
+containers is kept in memory, never the body itself.
+
+"""
+import asyncio
+import codecs
+import collections
+import json
+import re
+import typing as T
+
+from aiohttp import web
+
+_Validator = T.Callable[[T.Any], None]
+
+_TYPES = {
+    'array': lambda v: isinstance(v, list),
+    'boolean': lambda v: isinstance(v, bool),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'null': lambda v: v is None,
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'object': lambda v: isinstance(v, dict),
+    'string': lambda v: isinstance(v, str),
+}
+
+_COLLECTION_SEPARATORS = {
+    'csv': ',',
+    'ssv': ' ',
+    'tsv': '\t',
+    'pipes': '|',
+}
+
+
+class ValidationError(ValueError):
+    # language=rst
+    """Raised by compiled validators.
+
+    Attributes:
+        location (collections.deque): the path from the validated value to the
+            invalid value, as a sequence of keys and indices.
+
+    """
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+        self.location = collections.deque()
+
+    def __str__(self):
+        if len(self.location) == 0:
+            return self.message
+        location = ''.join(
+            '[%d]' % part if isinstance(part, int) else '.' + part
+            for part in self.location
+        )
+        return '%s: %s' % (location.lstrip('.'), self.message)
+
+
+def _all_of(checks: T.List[_Validator]) -> _Validator:
+    if len(checks) == 0:
+        return lambda value: None
+    if len(checks) == 1:
+        return checks[0]
+
+    def validate(value):
+        for check in checks:
+            check(value)
+    return validate
+
+
+def _compile_type(type_name: str) -> _Validator:
+    is_type = _TYPES.get(type_name)
+    if is_type is None:
+        return lambda value: None
+
+    def validate(value):
+        if not is_type(value):
+            raise ValidationError("must be of type %s" % type_name)
+    return validate
+
+
+def _compile_number_checks(schema, checks):
+    if 'minimum' in schema:
+        minimum = schema['minimum']
+        if schema.get('exclusiveMinimum', False):
+            def check_minimum(value):
+                if isinstance(value, (int, float)) and value <= minimum:
+                    raise ValidationError("must be greater than %s" % minimum)
+        else:
+            def check_minimum(value):
+                if isinstance(value, (int, float)) and value < minimum:
+                    raise ValidationError("must be at least %s" % minimum)
+        checks.append(check_minimum)
+    if 'maximum' in schema:
+        maximum = schema['maximum']
+        if schema.get('exclusiveMaximum', False):
+            def check_maximum(value):
+                if isinstance(value, (int, float)) and value >= maximum:
+                    raise ValidationError("must be less than %s" % maximum)
+        else:
+            def check_maximum(value):
+                if isinstance(value, (int, float)) and value > maximum:
+                    raise ValidationError("must be at most %s" % maximum)
+        checks.append(check_maximum)
+    if 'multipleOf' in schema:
+        multiple_of = schema['multipleOf']
+
+        def check_multiple_of(value):
+            if isinstance(value, (int, float)) and value % multiple_of != 0:
+                raise ValidationError("must be a multiple of %s" % multiple_of)
+        checks.append(check_multiple_of)
+
+
+def _compile_string_checks(schema, checks):
+    min_length = schema.get('minLength')
+    max_length = schema.get('maxLength')
+    if min_length is not None or max_length is not None:
+        min_length = min_length or 0
+        max_length = float('inf') if max_length is None else max_length
+
+        def check_length(value):
+            if isinstance(value, str) and \
+                    not min_length <= len(value) <= max_length:
+                raise ValidationError(
+                    "length must be between %s and %s" % (min_length, max_length)
+                )
+        checks.append(check_length)
+    if 'pattern' in schema:
+        search = re.compile(schema['pattern']).search
+
+        def check_pattern(value):
+            if isinstance(value, str) and search(value) is None:
+                raise ValidationError("must match %s" % schema['pattern'])
+        checks.append(check_pattern)
+
+
+def _compile_array_checks(schema, checks, compile_schema):
+    min_items = schema.get('minItems')
+    max_items = schema.get('maxItems')
+    if min_items is not None or max_items is not None:
+        min_items = min_items or 0
+        max_items = float('inf') if max_items is None else max_items
+
+        def check_size(value):
+            if isinstance(value, list) and \
+                    not min_items <= len(value) <= max_items:
+                raise ValidationError(
+                    "must have between %s and %s items" % (min_items, max_items)
+                )
+        checks.append(check_size)
+    if 'items' in schema:
+        validate_item = compile_schema(schema['items'])
+
+        def check_items(value):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    try:
+                        validate_item(item)
+                    except ValidationError as e:
+                        e.location.appendleft(i)
+                        raise
+        checks.append(check_items)
+
+
+def _compile_object_checks(schema, checks, compile_schema):
+    required = schema.get('required')
+    if required:
+        required = tuple(required)
+
+        def check_required(value):
+            if isinstance(value, dict):
+                for name in required:
+                    if name not in value:
+                        raise ValidationError("%s is required" % name)
+        checks.append(check_required)
+    properties = {
+        name: compile_schema(property_schema)
+        for name, property_schema in schema.get('properties', {}).items()
+    }
+    additional = schema.get('additionalProperties', True)
+    if additional is True:
+        validate_additional = None
+    elif additional is False:
+        def validate_additional(value):
+            raise ValidationError("unexpected property")
+    else:
+        validate_additional = compile_schema(additional)
+    if len(properties) > 0 or validate_additional is not None:
+        def check_properties(value):
+            if isinstance(value, dict):
+                for name, item in value.items():
+                    validate_property = properties.get(name, validate_additional)
+                    if validate_property is not None:
+                        try:
+                            validate_property(item)
+                        except ValidationError as e:
+                            e.location.appendleft(name)
+                            raise
+        checks.append(check_properties)
+
+
+class SchemaCompiler:
+    # language=rst
+    """Compiles JSON schemas into validator callables.
+
+    Compiled ``$ref`` targets are shared, so each definition is compiled only
+    once, and recursive definitions are supported.
+
+    Parameters:
+        definitions: the ``definitions`` section of the OpenAPI definition.
+
+    """
+    def __init__(self, definitions: T.Mapping[str, T.Any]):
+        self._definitions = definitions
+        self._compiled = {}
+        self._nodes = {}
+
+    def _compile_ref(self, ref: str) -> _Validator:
+        name = ref.rsplit('/', 1)[-1]
+        if name in self._compiled:
+            result = self._compiled[name]
+            if result is None:
+                # Recursive reference to a definition being compiled:
+                return lambda value: self._compiled[name](value)
+            return result
+        self._compiled[name] = None
+        result = self.compile(self._definitions[name])
+        self._compiled[name] = result
+        return result
+
+    def compile(self, schema: T.Mapping[str, T.Any]) -> _Validator:
+        # language=rst
+        """Returns a callable that raises :exc:`ValidationError` for invalid values."""
+        if '$ref' in schema:
+            return self._compile_ref(schema['$ref'])
+        checks = []
+        if 'type' in schema:
+            checks.append(_compile_type(schema['type']))
+        if 'enum' in schema:
+            enum = schema['enum']
+
+            def check_enum(value):
+                if value not in enum:
+                    raise ValidationError("must be one of %s" % json.dumps(enum))
+            checks.append(check_enum)
+        _compile_number_checks(schema, checks)
+        _compile_string_checks(schema, checks)
+        _compile_array_checks(schema, checks, self.compile)
+        _compile_object_checks(schema, checks, self.compile)
+        for sub_schema in schema.get('allOf', ()):
+            checks.append(self.compile(sub_schema))
+        return _all_of(checks)
+
+    def _flatten(self, schema: T.Mapping[str, T.Any]) -> T.Mapping[str, T.Any]:
+        # language=rst
+        """Follows ``$ref``\\s, and merges ``allOf`` sub-schemas into one schema."""
+        while '$ref' in schema:
+            schema = self._definitions[schema['$ref'].rsplit('/', 1)[-1]]
+        if 'allOf' not in schema:
+            return schema
+        result = {k: v for k, v in schema.items() if k != 'allOf'}
+        for sub_schema in schema['allOf']:
+            for key, value in self._flatten(sub_schema).items():
+                if key == 'properties':
+                    result['properties'] = dict(result.get('properties', {}), **value)
+                elif key == 'required':
+                    result['required'] = list(result.get('required', ())) + list(value)
+                else:
+                    result.setdefault(key, value)
+        return result
+
+    def compile_node(self, schema: T.Mapping[str, T.Any]) -> 'SchemaNode':
+        # language=rst
+        """Compiles ``schema`` for use by a :class:`StreamValidator`."""
+        if '$ref' not in schema:
+            return SchemaNode(self, self._flatten(schema))
+        name = schema['$ref'].rsplit('/', 1)[-1]
+        node = self._nodes.get(name)
+        if node is None:
+            # Registered before it's filled in, for recursive definitions:
+            node = SchemaNode.__new__(SchemaNode)
+            self._nodes[name] = node
+            node.__init__(self, self._flatten(schema))
+        return node
+
+
+class SchemaNode:
+    # language=rst
+    """A schema, compiled for validation of a stream of JSON tokens.
+
+    Scalar values are checked by :attr:`validate`, the compiled validator of
+    the whole schema.  Containers are checked structurally, one member at a
+    time, by :class:`StreamValidator`.
+
+    """
+    __slots__ = ('type', 'validate', 'properties', 'additional', 'items',
+                 'required', 'min_items', 'max_items')
+
+    def __init__(self, compiler: SchemaCompiler, schema: T.Mapping[str, T.Any]):
+        self.type = schema.get('type')
+        self.validate = compiler.compile(schema)
+        self.properties = {
+            name: compiler.compile_node(property_schema)
+            for name, property_schema in schema.get('properties', {}).items()
+        }
+        additional = schema.get('additionalProperties', True)
+        # None means "anything goes", False means "not allowed":
+        self.additional = None if additional is True else \
+            False if additional is False else compiler.compile_node(additional)
+        self.items = None if 'items' not in schema \
+            else compiler.compile_node(schema['items'])
+        self.required = frozenset(schema.get('required', ()))
+        self.min_items = schema.get('minItems', 0)
+        self.max_items = schema.get('maxItems')
+
+
+_JSON_TOKEN = re.compile(r'''
+    [ \t\n\r]*
+    (?:
+        (?P<punctuation>[{}\[\],:])
+      | (?P<string>"(?:[^"\\]|\\.)*")
+      | (?P<literal>-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null)
+    )
+''', re.VERBOSE)
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_JSON_DELIMITERS = frozenset(' \t\n\r,:]}')
+_JSON_LITERAL_START = frozenset('-0123456789tfn')
+_MAX_LITERAL_LENGTH = 1024
+
+
+class _Frame:
+    __slots__ = ('node', 'is_object', 'key', 'expect', 'count', 'seen')
+
+    def __init__(self, node: T.Optional[SchemaNode], is_object: bool):
+        self.node = node
+        self.is_object = is_object
+        self.key = None
+        # The next token: 'key', 'colon', 'value', or 'comma' (or a closer):
+        self.expect = 'key' if is_object else 'value'
+        # The number of members (objects) or items (arrays) seen so far:
+        self.count = 0
+        self.seen = set() if is_object and node is not None and node.required \
+            else None
+
+
+def _loads(text: str) -> T.Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        raise ValidationError("malformed JSON") from None
+
+
+class StreamValidator:
+    # language=rst
+    """Validates a JSON document, fed to it in chunks, against a schema.
+
+    Example::
+
+        validator = StreamValidator(node)
+        for chunk in chunks:
+            validator.feed(chunk)
+        validator.close()
+        if validator.error is not None:
+            ...
+
+    Attributes:
+        error (ValidationError): the first error found, or ``None``.  The
+            document isn't validated any further after the first error.
+            Malformed JSON and invalid UTF-8 are reported here as well;
+            :meth:`feed` and :meth:`close` don't raise.
+
+    """
+    def __init__(self, node: SchemaNode):
+        self._root = node
+        self._stack = []
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._done = False
+        self.error = None
+
+    def feed(self, chunk: bytes):
+        if self.error is not None:
+            return
+        try:
+            self._buffer += self._decoder.decode(chunk)
+        except UnicodeDecodeError:
+            self.error = ValidationError("invalid UTF-8")
+            return
+        self._process(final=False)
+
+    def close(self):
+        if self.error is not None:
+            return
+        try:
+            self._buffer += self._decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            self.error = ValidationError("invalid UTF-8")
+            return
+        self._process(final=True)
+        if self.error is None and (len(self._stack) > 0 or not self._done):
+            self.error = ValidationError("truncated JSON document")
+
+    def _process(self, final: bool):
+        buffer = self._buffer
+        pos = 0
+        try:
+            while True:
+                match = _JSON_TOKEN.match(buffer, pos)
+                if match is None:
+                    rest = _JSON_WHITESPACE.match(buffer, pos).end()
+                    if rest == len(buffer) or not final and (
+                        buffer[rest] == '"' or
+                        buffer[rest] in _JSON_LITERAL_START and
+                        len(buffer) - rest <= _MAX_LITERAL_LENGTH
+                    ):
+                        # Wait for the rest of this token:
+                        break
+                    raise ValidationError("malformed JSON")
+                end = match.end()
+                if match.lastgroup == 'literal' and (
+                    end == len(buffer) or buffer[end] not in _JSON_DELIMITERS
+                ):
+                    # The literal may continue in the next chunk:
+                    if end < len(buffer) and (
+                        final or end - match.start('literal') > _MAX_LITERAL_LENGTH
+                    ):
+                        raise ValidationError("malformed JSON")
+                    if not final:
+                        break
+                pos = end
+                self._token(match.lastgroup, match.group(match.lastgroup))
+        except (IndexError, ValueError) as e:
+            # Grammar errors are caught by _token(), so anything but a
+            # ValidationError is a bug; still, it's malformed input, not a
+            # reason to crash the caller:
+            if not isinstance(e, ValidationError):
+                e = ValidationError("malformed JSON")
+            for frame in self._stack:
+                if frame.is_object:
+                    if frame.key is not None:
+                        e.location.append(frame.key)
+                elif frame.count > 0:
+                    e.location.append(frame.count - 1)
+            self.error = e
+            self._stack = []
+        self._buffer = buffer[pos:]
+
+    def _value_node(self) -> T.Optional[SchemaNode]:
+        # language=rst
+        """The schema of the value that starts at the current token."""
+        if len(self._stack) == 0:
+            if self._done:
+                raise ValidationError("unexpected data after JSON document")
+            return self._root
+        frame = self._stack[-1]
+        if frame.expect != 'value':
+            raise ValidationError("malformed JSON")
+        if frame.is_object:
+            node = frame.node
+            if node is None:
+                return None
+            result = node.properties.get(frame.key, node.additional)
+            if result is False:
+                raise ValidationError("unexpected property")
+            return result
+        frame.count += 1
+        node = frame.node
+        if node is None:
+            return None
+        if node.max_items is not None and frame.count > node.max_items:
+            raise ValidationError("must have at most %s items" % node.max_items)
+        return node.items
+
+    def _end_value(self):
+        if len(self._stack) == 0:
+            self._done = True
+        else:
+            self._stack[-1].expect = 'comma'
+
+    def _token(self, kind: str, text: str):
+        stack = self._stack
+        if kind == 'punctuation':
+            if text == '{' or text == '[':
+                node = self._value_node()
+                is_object = text == '{'
+                if node is not None and node.type is not None and \
+                        node.type != ('object' if is_object else 'array'):
+                    raise ValidationError("must be of type %s" % node.type)
+                stack.append(_Frame(node, is_object))
+                return
+            if len(stack) == 0:
+                raise ValidationError("malformed JSON")
+            frame = stack[-1]
+            if text == ':':
+                if frame.expect != 'colon':
+                    raise ValidationError("malformed JSON")
+                frame.expect = 'value'
+            elif text == ',':
+                if frame.expect != 'comma':
+                    raise ValidationError("malformed JSON")
+                frame.expect = 'key' if frame.is_object else 'value'
+            else:
+                # A closer must match the open container, and may only follow
+                # a member, or the opener of an empty container:
+                if frame.is_object != (text == '}') or \
+                        frame.expect != 'comma' and frame.count > 0:
+                    raise ValidationError("malformed JSON")
+                stack.pop()
+                node = frame.node
+                if frame.seen is not None and not node.required <= frame.seen:
+                    raise ValidationError("%s is required" % ', '.join(
+                        sorted(node.required - frame.seen)
+                    ))
+                if not frame.is_object and node is not None and \
+                        frame.count < node.min_items:
+                    raise ValidationError(
+                        "must have at least %s items" % node.min_items
+                    )
+                self._end_value()
+            return
+        if len(stack) > 0 and stack[-1].expect == 'key':
+            if kind != 'string':
+                raise ValidationError("malformed JSON")
+            frame = stack[-1]
+            frame.key = _loads(text)
+            frame.expect = 'colon'
+            frame.count += 1
+            if frame.seen is not None:
+                frame.seen.add(frame.key)
+            return
+        node = self._value_node()
+        value = _loads(text)
+        if node is not None:
+            node.validate(value)
+        self._end_value()
+
+
+async def validate_stream(chunks: T.AsyncIterable[bytes], node: SchemaNode,
+                          on_result: T.Callable[[T.Optional[Exception]], None]) \
+        -> T.AsyncIterator[bytes]:
+    # language=rst
+    """Yields ``chunks`` unchanged, while validating them against ``node``.
+
+    When the stream is complete, ``on_result`` is called with the first
+    :exc:`ValidationError`, or with ``None`` if the document is valid.
+    Validation never interrupts the stream: if the validator itself fails,
+    validation stops, and ``on_result`` is called with that exception instead.
+
+    """
+    validator = StreamValidator(node)
+    failure = None
+    async for chunk in chunks:
+        if failure is None:
+            try:
+                validator.feed(chunk)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failure = e
+        yield chunk
+    if failure is None:
+        try:
+            validator.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failure = e
+    on_result(validator.error if failure is None else failure)
+
+
+def _compile_coercion(parameter: T.Mapping[str, T.Any]) \
+        -> T.Callable[[str], T.Any]:
+    # language=rst
+    """Returns a callable that converts a string parameter to its declared type."""
+    type_name = parameter.get('type')
+    if type_name == 'integer':
+        def coerce(s):
+            try:
+                return int(s)
+            except ValueError:
+                raise ValidationError("must be an integer") from None
+    elif type_name == 'number':
+        def coerce(s):
+            try:
+                return float(s)
+            except ValueError:
+                raise ValidationError("must be a number") from None
+    elif type_name == 'boolean':
+        def coerce(s):
+            if s == 'true':
+                return True
+            if s == 'false':
+                return False
+            raise ValidationError("must be true or false")
+    elif type_name == 'array':
+        coerce_item = _compile_coercion(parameter.get('items', {}))
+        separator = _COLLECTION_SEPARATORS.get(
+            parameter.get('collectionFormat', 'csv'), ','
+        )
+
+        def coerce(s):
+            if isinstance(s, list):
+                return [coerce_item(item) for item in s]
+            return [coerce_item(item) for item in s.split(separator)]
+    else:
+        def coerce(s):
+            return s
+    return coerce
+
+
+def _compile_parameter(parameter: T.Mapping[str, T.Any],
+                       compiler: SchemaCompiler) \
+        -> T.Optional[T.Callable[[web.Request], None]]:
+    location = parameter.get('in')
+    name = parameter['name']
+    # Path parameters are checked only if the aiohttp route uses the same
+    # name, so a missing path parameter isn't an error:
+    required = parameter.get('required', False) and location != 'path'
+    if location == 'query':
+        if parameter.get('collectionFormat') == 'multi':
+            def get(request):
+                result = request.rel_url.query.getall(name, None)
+                return result if result else None
+        else:
+            def get(request):
+                return request.rel_url.query.get(name)
+    elif location == 'header':
+        def get(request):
+            return request.headers.get(name)
+    elif location == 'path':
+        def get(request):
+            return request.match_info.get(name)
+    else:
+        # Body parameters are validated separately; formData isn't supported.
+        return None
+    coerce = _compile_coercion(parameter)
+    # Keyword ``required`` means something else in parameter objects:
+    validate = compiler.compile({
+        key: value for key, value in parameter.items() if key != 'required'
+    })
+    description = '%s parameter %s' % (location, name)
+
+    def validate_parameter(request):
+        value = get(request)
+        try:
+            if value is None:
+                if required:
+                    raise ValidationError("is required")
+                return
+            validate(coerce(value))
+        except ValidationError as e:
+            raise web.HTTPBadRequest(
+                text="Invalid %s: %s" % (description, e)
+            ) from None
+    return validate_parameter
+
+
+async def _validate_body(request: web.Request, node: SchemaNode):
+    # language=rst
+    """Validates the request body against ``node`` while it is received.
+
+    Invalid bodies are rejected as soon as the first error is found, without
+    receiving the rest.  Valid bodies remain available to the handler, through
+    :meth:`request.read() <aiohttp.web.Request.read>` and friends.
+
+    """
+    validator = StreamValidator(node)
+    body = bytearray()
+    # Ugly: we're using non-public members of :class:`aiohttp.web.Request`,
+    # because it has no public way to hand a body that was already read back
+    # to the request.
+    max_size = request._client_max_size
+    while True:
+        chunk = await request.content.readany()
+        if not chunk:
+            validator.close()
+            break
+        body.extend(chunk)
+        if max_size and len(body) >= max_size:
+            raise web.HTTPRequestEntityTooLarge()
+        validator.feed(chunk)
+        if validator.error is not None:
+            break
+    if validator.error is not None:
+        raise web.HTTPBadRequest(
+            text="Invalid request body: %s" % validator.error
+        )
+    request._read_bytes = bytes(body)
+
+
+def compile_request_validator(parameters: T.Mapping[str, T.Mapping[str, T.Any]],
+                              compiler: SchemaCompiler) \
+        -> T.Optional[T.Callable[[web.Request], T.Awaitable[None]]]:
+    # language=rst
+    """Compiles a validator for requests with the given ``parameters``.
+
+    Parameters:
+        parameters: parameter objects by name, as in
+            :attr:`Operation.parameters <aiohttp_extras._swagger.Operation.parameters>`.
+        compiler: the compiler for all schemas in the definition.
+
+    Returns:
+        A coroutine function that raises :exc:`aiohttp.web.HTTPBadRequest`
+        for invalid requests, or ``None`` if there's nothing to validate.
+        JSON request bodies are validated incrementally, by a
+        :class:`StreamValidator`.
+
+    """
+    validators = []
+    body_parameter = None
+    for parameter in parameters.values():
+        if parameter.get('in') == 'body':
+            body_parameter = parameter
+            continue
+        validator = _compile_parameter(parameter, compiler)
+        if validator is not None:
+            validators.append(validator)
+    body_node = None
+    if body_parameter is not None:
+        body_node = compiler.compile_node(body_parameter.get('schema', {}))
+        body_required = body_parameter.get('required', False)
+    if len(validators) == 0 and body_node is None:
+        return None
+
+    async def validate_request(request: web.Request):
+        for validator in validators:
+            validator(request)
+        if body_node is None:
+            return
+        if not request.body_exists:
+            if body_required:
+                raise web.HTTPBadRequest(text="Request body is required")
+            return
+        await _validate_body(request, body_node)
+    return validate_request
+
@@ -1,15 +1,26 @@
+import asyncio
+import collections
+import inspect
 import logging
+import random
 import re
+import types
 import typing as T
 
-from aiohttp import web
-from multidict import MultiDict
+from aiohttp import web, hdrs
+from multidict import MultiDict, MultiDictProxy
 
-from . import _conditional
+from . import (
+    _cache, _conditional, _content_coding, _content_negotiation, _json,
+    _loader, _single_flight, _swagger, _validation
+)
 
 _logger = logging.getLogger(__name__)
 
 _GET_IN_PROGRESS = 'aiohttp_extras.GET_IN_PROGRESS'
+_CANONICAL_QUERY_CACHE_SIZE = 256
+_NO_DEFAULTS = types.MappingProxyType({})
+_JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
 
 
 def _slashify(s):
@@ -17,29 +28,357 @@ def _slashify(s):
     return s if s.endswith('/') else s + '/'
 
 
+async def _json_serializer(view) -> T.AsyncIterable[bytes]:
+    # language=rst
+    """Default serializer of :class:`View`, based on :func:`_json.encode`."""
+    if view.to_dict is None:
+        raise web.HTTPNotAcceptable(text="No JSON representation available.")
+    return _json.encode(
+        await view.to_dict(), max_concurrency=view.embed_concurrency
+    )
+
+
+class _CanonicalQuery:
+    # language=rst
+    """A request query, merged with the default query parameters of a view.
+
+    Attributes:
+        defaults: the default query parameters this query was built from.
+        query (MultiDictProxy): the merged query.
+        query_string: the merged query, encoded.
+        is_canonical (bool): ``True`` if the original query string already was
+            canonical, ie. the response needs no ``Content-Location:`` header.
+
+    """
+    __slots__ = ('defaults', 'query', 'query_string', 'is_canonical')
+
+    def __init__(self, defaults: T.Mapping[str, str], rel_url: web.URL):
+        query = MultiDict(defaults)
+        query.update(rel_url.query)
+        self.defaults = defaults
+        self.query = MultiDictProxy(query)
+        self.query_string = web.URL('/').with_query(query).raw_query_string
+        self.is_canonical = self.query_string == rel_url.raw_query_string
+
+
+class _TrieNode:
+    __slots__ = ('static', 'wildcard', 'views')
+
+    def __init__(self):
+        self.static = {}
+        self.wildcard = None
+        self.views = []
+
+
+class _RouteIndex:
+    # language=rst
+    """Reverse index from relative URLs to :class:`View` classes.
+
+    Plain resources are indexed in a dictionary by path.  Dynamic resources are
+    indexed in a trie of path segments, where each templated segment is a
+    wildcard, so resolving a URL costs *O(path segments)* instead of a linear
+    scan over all resources.  Candidates found in the trie are verified with
+    the resource's own pattern, which also produces the match dict.
+
+    Dynamic resources with custom regular expressions (eg. ``{path:.+}``) may
+    match across segment boundaries.  These are kept in a list and tried one
+    by one.  If more than one dynamic resource matches, the one registered
+    first wins, like in aiohttp's own router; an exactly matching plain
+    resource always wins.
+
+    The index is built from the resources in the router, including those of
+    sub-applications, that were added with :meth:`View.add_to_router`.  It is
+    compiled lazily, and compiled again whenever the number of resources in
+    the router or in any of its sub-applications changes, eg. when
+    :meth:`aiohttp.web.Application.add_subapp` adds a sub-application and
+    prefixes its resources.
+
+    """
+    def __init__(self, router: web.UrlDispatcher):
+        self._router = router
+        self._signature = None
+        self._subrouters = ()
+        self._paths = {}
+        self._trie = _TrieNode()
+        self._unindexed = []
+
+    def _current_signature(self):
+        return len(self._router.resources()), tuple(
+            len(router.resources()) for router in self._subrouters
+        )
+
+    def _resources(self, router: web.UrlDispatcher, subrouters: T.List):
+        # language=rst
+        """Yields ``(view_class, resource)`` pairs, in the router's order."""
+        for resource in router.resources():
+            view_class = getattr(resource, 'rest_utils_class', None)
+            if view_class is not None:
+                yield view_class, resource
+                continue
+            app = resource.get_info().get('app')
+            if app is not None:
+                subrouters.append(app.router)
+                yield from self._resources(app.router, subrouters)
+
+    def _compile(self):
+        self._paths = {}
+        self._trie = _TrieNode()
+        self._unindexed = []
+        subrouters = []
+        resources = self._resources(self._router, subrouters)
+        for order, (view_class, resource) in enumerate(resources):
+            info = resource.get_info()
+            if 'path' in info:
+                self._paths.setdefault(info['path'], view_class)
+                continue
+            candidate = (order, view_class, resource)
+            pattern = info['pattern'].pattern
+            group = '>' + web.DynamicResource.GOOD + ')'
+            if pattern.count('(?P<') != pattern.count(group):
+                self._unindexed.append(candidate)
+                continue
+            node = self._trie
+            for segment in info['formatter'].split('/'):
+                if '{' in segment:
+                    if node.wildcard is None:
+                        node.wildcard = _TrieNode()
+                    node = node.wildcard
+                else:
+                    node = node.static.setdefault(segment, _TrieNode())
+            node.views.append(candidate)
+        self._subrouters = tuple(subrouters)
+        self._signature = self._current_signature()
+
+    def _candidates(self, node: _TrieNode, segments: T.List[str], i: int):
+        if i == len(segments):
+            yield from node.views
+            return
+        child = node.static.get(segments[i])
+        if child is not None:
+            yield from self._candidates(child, segments, i + 1)
+        if node.wildcard is not None and segments[i] != '':
+            yield from self._candidates(node.wildcard, segments, i + 1)
+
+    def resolve(self, raw_path: str) \
+            -> T.Optional[T.Tuple[T.Type['View'], T.Dict[str, str]]]:
+        if self._signature != self._current_signature():
+            self._compile()
+        view_class = self._paths.get(raw_path)
+        if view_class is not None:
+            return view_class, {}
+        candidates = list(self._candidates(self._trie, raw_path.split('/'), 0))
+        candidates.extend(self._unindexed)
+        candidates.sort(key=lambda candidate: candidate[0])
+        for order, view_class, resource in candidates:
+            match_dict = resource._match(raw_path)
+            if match_dict is not None:
+                return view_class, match_dict
+        return None
+
+
+async def _next_chunk(chunks: T.AsyncIterator[bytes]) -> T.Optional[bytes]:
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
 class View(web.View):
 
+    content_encodings = _content_coding.AVAILABLE_CONTENT_ENCODINGS
+    # language=rst
+    """Content codings this view can produce, best first."""
+
+    compression_level = None
+    # language=rst
+    """Compression level, or ``None`` for the default of the negotiated coding.
+
+    Levels mean different things for different codings, so this can also be a
+    mapping from content codings to levels, eg. ``{'br': 5, 'gzip': 6}``.  See
+    :func:`_content_coding.compressobj`.
+
+    """
+
+    compression_min_size = 1024
+    # language=rst
+    """Response bodies smaller than this number of bytes are never compressed."""
+
+    embed_concurrency = 8
+    # language=rst
+    """Maximum number of embedded views that are resolved concurrently.
+
+    Views in the data returned by :attr:`to_dict` are resolved ahead of
+    serialization, but still serialized in their original order; see
+    :func:`~aiohttp_extras._json.encode`.
+
+    """
+
+    coalesce_requests = False
+    # language=rst
+    """Whether concurrent identical GET requests share one response body.
+
+    If ``True``, concurrent GET requests for the same :attr:`canonical_rel_url`,
+    with the same negotiated content type and ``Authorization:`` header, share
+    a single call to the serializer.  Only enable this for views whose
+    representation doesn't depend on anything else in the request.
+
+    """
+
+    coalesce_replay_limit = 1024 * 1024
+    # language=rst
+    """Number of bytes a shared body may have produced for requests to join.
+
+    See :class:`~aiohttp_extras._single_flight.SingleFlight`.
+
+    """
+
+    representation_cache = None
+    # language=rst
+    """A :class:`~aiohttp_extras.RepresentationCache`, or ``None``.
+
+    If set, encoded response bodies of views with an ETag are cached, and
+    served from the cache for as long as the URL, content type and ETag stay
+    the same.  As with :attr:`coalesce_requests`, the representation must not
+    depend on anything else in the request, except the content coding.
+
+    """
+
+    stale_while_revalidate = None
+    # language=rst
+    """Maximum staleness, in seconds, of representations served while revalidating.
+
+    Only used with a :attr:`representation_cache`.  If the ETag of this view has
+    changed, and the representation with the previous ETag was last known to be
+    fresh at most this many seconds ago, then that stale representation is
+    served immediately, and a fresh one is generated in the background.
+
+    The fresh representation is generated after the response was sent, by a
+    new instance of this view, for a copy of the request with the same URL and
+    headers.  Request-scoped state of the original request, such as anything
+    a middleware stored in it (e.g. a database connection), is not available
+    then; views that depend on such state must not set this attribute.
+
+    """
+
+    stale_if_error = None
+    # language=rst
+    """Maximum staleness, in seconds, of representations served after an error.
+
+    Only used with a :attr:`representation_cache`.  If generating a fresh
+    representation fails before any of it was sent, the latest cached
+    representation is served instead, if it's fresh enough.  HTTP exceptions
+    other than server errors (5xx) are never masked.
+
+    """
+
+    response_validation_rate = 0.0
+    # language=rst
+    """Fraction of generated GET responses to validate against the definition.
+
+    Sampled responses are validated while they stream, against the schema of
+    the ``200`` response of the ``GET`` operation; see
+    :class:`~aiohttp_extras._validation.StreamValidator`.  Responses served
+    from a :attr:`representation_cache` aren't validated again.
+
+    """
+
+    response_validation_sink = None
+    # language=rst
+    """Callable receiving the result of every sampled response validation.
+
+    Called as ``sink(view, error)``, where ``error`` is a
+    :exc:`~aiohttp_extras._validation.ValidationError`, or ``None`` for valid
+    responses.  If the validator itself fails, ``error`` is the exception it
+    raised.  If ``None``, invalid responses are logged as warnings.
+
+    Validation is a diagnostic: neither validator nor sink failures affect the
+    response, which is always sent unchanged.
+
+    """
+
+    batchable = False
+    # language=rst
+    """Whether a :class:`~aiohttp_extras.BatchView` may dispatch to this view.
+
+    Batched requests bypass the application's middlewares, so only enable this
+    for views that do their own authorization.
+
+    """
+
+    _content_encoding_matcher = _content_negotiation._ContentEncodingMatcher(
+        content_encodings
+    )
+
+    _serializers = {_JSON_CONTENT_TYPE: _json_serializer}
+    _content_type_matcher = _content_negotiation._ContentTypeMatcher(_serializers)
+
+    _canonical_queries = collections.OrderedDict()
+    _swagger_path_item = None
+    _flights = _single_flight.SingleFlight(coalesce_replay_limit)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._canonical_queries = collections.OrderedDict()
+        cls._flights = _single_flight.SingleFlight(cls.coalesce_replay_limit)
+        cls._content_encoding_matcher = \
+            _content_negotiation._ContentEncodingMatcher(cls.content_encodings)
+
     def __init__(
         self,
         request: web.Request,
         match_dict: T.Optional[T.Mapping[str, str]]=None,
         *args, **kwargs
     ):
-        super().__init__()
-        if match_dict is None:
-            rel_url = request.rel_url
+        super().__init__(request)
+        self.__query = None
+        self.__canonical_rel_url = None
+        if match_dict is not None:
+            # The relative URL is derived from the match dict lazily, in
+            # :attr:`rel_url`, because embedded views often never need it.
+            self.__rel_url = None
+            self.__match_dict = dict(match_dict)
+            return
+        self.__rel_url = request.rel_url
+        match_info = request.match_info
+        if match_info.route.resource is self.aiohttp_resource():
+            self.__match_dict = dict(match_info)
         else:
-            rel_url = self.aiohttp_resource().url_for(**match_dict)
-        self.__rel_url = rel_url
-        self.__embed = None
+            self.__match_dict = dict(
+                # Ugly: we're using non-public member ``_match()`` of
+                # :class:`aiohttp.web.Resource`.  But most alternatives are
+                # equally ugly.
+                self.aiohttp_resource()._match(request.rel_url.raw_path)
+            )
+
+    @classmethod
+    def from_match(cls, request: web.Request, match_dict: T.Dict[str, str]):
+        # language=rst
+        """Fast alternative constructor, for embedding many views at once.
+
+        Unlike the regular constructor, this method doesn't copy ``match_dict``,
+        so the caller must not modify it afterwards.  Subclasses that override
+        :meth:`__init__` are constructed the regular way.
+
+        Example::
+
+            async def _links(self):
+                return {
+                    'item': [
+                        Member.from_match(self.request, {'member': row['id']})
+                        for row in await self.rows()
+                    ]
+                }
+
+        """
+        if cls.__init__ is not View.__init__:
+            return cls(request, match_dict)
+        self = cls.__new__(cls)
+        web.View.__init__(self, request)
+        self.__rel_url = None
         self.__query = None
         self.__canonical_rel_url = None
-        self.__match_dict = dict(
-            # Ugly: we're using non-public member ``_match()`` of
-            # :class:`aiohttp.web.Resource`.  But most alternatives are
-            # equally ugly.
-            self.aiohttp_resource()._match(self.rel_url.raw_path)
-        )
+        self.__match_dict = match_dict
+        return self
 
     def __getitem__(self, item):
         # language=rst
@@ -65,34 +404,96 @@ class View(web.View):
     @property
     def rel_url(self) -> web.URL:
         # language=rst
-        """The relative URL as passed to the constructor."""
+        """The relative URL of this view.
+
+        This is either the URL of the request, or the URL built from the match
+        dict passed to the constructor.
+
+        """
+        if self.__rel_url is None:
+            self.__rel_url = self.aiohttp_resource().url_for(**self.__match_dict)
         return self.__rel_url
 
+    @classmethod
+    def _lookup_canonical_query(cls, defaults: T.Mapping[str, str],
+                                rel_url: web.URL) -> _CanonicalQuery:
+        # language=rst
+        """Returns the canonical query for ``rel_url``.
+
+        Hot endpoints see the same query strings over and over again, so
+        results are kept in a bounded LRU cache per view class, keyed by the
+        raw query string.  A cached entry is only used if it was built from
+        the same default query parameters.
+
+        """
+        cache = cls._canonical_queries
+        key = rel_url.raw_query_string
+        entry = cache.get(key)
+        if entry is not None and (
+            entry.defaults is defaults or entry.defaults == defaults
+        ):
+            cache.move_to_end(key)
+            return entry
+        entry = _CanonicalQuery(defaults, rel_url)
+        cache[key] = entry
+        if len(cache) > _CANONICAL_QUERY_CACHE_SIZE:
+            cache.popitem(last=False)
+        return entry
+
+    @property
+    def _canonical_query(self) -> _CanonicalQuery:
+        if self.__query is None:
+            self.__query = self._lookup_canonical_query(
+                self.default_query_params, self.rel_url
+            )
+        return self.__query
+
     @property
     def canonical_rel_url(self) -> web.URL:
         # language=rst
         """Like :meth:`rel_url`, but with all default query parameters explicitly listed."""
         if self.__canonical_rel_url is None:
-            self.__canonical_rel_url = self.__rel_url.with_query(self.query)
+            canonical_query = self._canonical_query
+            if canonical_query.is_canonical:
+                self.__canonical_rel_url = self.rel_url
+            else:
+                self.__canonical_rel_url = self.rel_url.with_query(
+                    canonical_query.query
+                )
         # noinspection PyTypeChecker
         return self.__canonical_rel_url
 
     @property
-    def query(self):
+    def query(self) -> MultiDictProxy:
         # language=rst
         """Like ``self.rel_url.query``, but with default parameters added.
 
         These default parameters are retrieved from the swagger definition.
+        The returned mapping is shared between views, and therefore immutable.
 
         """
-        if self.__query is None:
-            self.__query = MultiDict(self.default_query_params)
-            self.__query.update(self.__rel_url.query)
-        return self.__query
+        return self._canonical_query.query
 
     @property
-    def default_query_params(self) -> T.Dict[str, str]:
-        return {}
+    def default_query_params(self) -> T.Mapping[str, str]:
+        # language=rst
+        """Default query parameters of this view, from the OpenAPI definition.
+
+        The defaults of the operation for the request method are used if this
+        view handles the current request; embedded views use their ``GET``
+        operation.  The returned mapping was computed at startup (see
+        :attr:`Operation.defaults <aiohttp_extras._swagger.Operation.defaults>`)
+        and is immutable.  Subclasses may override this property.
+
+        """
+        path_item = self._path_item()
+        if path_item is None:
+            return _NO_DEFAULTS
+        if self.request.match_info.route.resource is self.aiohttp_resource():
+            operation = path_item.operation(self.request.method)
+        else:
+            operation = path_item.operation(hdrs.METH_GET)
+        return _NO_DEFAULTS if operation is None else operation.defaults
 
     @classmethod
     def add_to_router(cls,
@@ -100,15 +501,20 @@ class View(web.View):
                       path: str,
                       expect_handler: T.Callable=None):
         # language=rst
-        """Adds this View class to the aiohttp router."""
+        """Adds this View class to the aiohttp router.
+
+        Raises:
+            TypeError: if this class still has abstract methods, such as
+                those of :class:`~aiohttp_extras.ETagMixin`.
+
+        """
+        if inspect.isabstract(cls):
+            raise TypeError(
+                "Can't route to abstract view class %s; it must implement %s" % (
+                    cls.__name__, ', '.join(sorted(cls.__abstractmethods__))
+                )
+            )
         cls._aiohttp_resource = router.add_resource(path)
-        # Register the current class in the appropriate registry:
-        # if isinstance(cls._aiohttp_resource, web.DynamicResource):
-        #     View.PATTERNS[cls._aiohttp_resource.get_info()['pattern']] = cls
-        # elif isinstance(cls._aiohttp_resource, web.PlainResource):
-        #     View.PATHS[cls._aiohttp_resource.get_info()['path']] = cls
-        # else:
-        #     _logger.critical("aiohttp router method 'add_resource()' returned resource object of unexpected type %s", cls._aiohttp_resource.__class__)
         if (
             not isinstance(cls._aiohttp_resource, web.DynamicResource) and
             not isinstance(cls._aiohttp_resource, web.PlainResource)
@@ -118,6 +524,35 @@ class View(web.View):
         cls._aiohttp_resource.add_route('*', cls, expect_handler=expect_handler)
         return cls._aiohttp_resource
 
+    @staticmethod
+    def resolve_url(router: web.UrlDispatcher, url: T.Union[str, web.URL]) \
+            -> T.Optional[T.Tuple[T.Type['View'], T.Dict[str, str]]]:
+        # language=rst
+        """Resolves a relative URL to a view class and match dict, in-process.
+
+        Only views added with :meth:`add_to_router` to ``router``, or to the
+        router of one of its sub-applications, are considered.  This is useful
+        for following links (eg. to embed the resources they point to) without
+        HTTP round-trips.
+
+        Returns:
+            A tuple ``(view_class, match_dict)``, or ``None`` if no view class
+            matches the path of ``url``.
+
+        Example::
+
+            resolved = View.resolve_url(self.request.app.router, link['href'])
+            if resolved is not None:
+                view_class, match_dict = resolved
+                embedded = view_class.from_match(self.request, match_dict)
+
+        """
+        route_index = getattr(router, 'rest_utils_route_index', None)
+        if route_index is None:
+            route_index = _RouteIndex(router)
+            router.rest_utils_route_index = route_index
+        return route_index.resolve(web.URL(url).raw_path)
+
     @classmethod
     def aiohttp_resource(cls) -> T.Union[web.PlainResource, web.DynamicResource]:
         assert hasattr(cls, '_aiohttp_resource'), \
@@ -127,27 +562,530 @@ class View(web.View):
         except AttributeError:
             raise AssertionError
 
+    def _path_item(self) -> T.Optional[_swagger.PathItem]:
+        # language=rst
+        """The path item of this view in the OpenAPI definition, if any.
+
+        Resolved once per view class, through the
+        :class:`~aiohttp_extras._swagger.SwaggerIndex` of the application.
+
+        """
+        index = _swagger.swagger_index(self.request.app)
+        if index is None:
+            return None
+        cached = self._swagger_path_item
+        if cached is not None and cached[0] is index:
+            return cached[1]
+        info = self.aiohttp_resource().get_info()
+        path = info.get('formatter', info.get('path'))
+        path_item = None if path is None else index.resolve(path)
+        type(self)._swagger_path_item = (index, path_item)
+        return path_item
+
+    @classmethod
+    def _allowed_methods(cls) -> T.FrozenSet[str]:
+        return frozenset(
+            method for method in hdrs.METH_ALL
+            if getattr(cls, method.lower(), None) is not None
+        )
+
+    def _raise_allowed_methods(self):
+        path_item = self._path_item()
+        allowed_methods = self._allowed_methods() if path_item is None \
+            else path_item.allowed_methods
+        raise web.HTTPMethodNotAllowed(self.request.method, allowed_methods)
+
+    async def options(self) -> web.Response:
+        # language=rst
+        """Responds with the allowed methods and, if available, their operations.
+
+        With an OpenAPI definition, the response was precomputed at startup;
+        see :class:`~aiohttp_extras._swagger.PathItem`.  Otherwise, the
+        ``Allow:`` header lists the methods implemented by this class.
+
+        """
+        path_item = self._path_item()
+        if path_item is None:
+            return web.Response(headers={
+                hdrs.ALLOW: ','.join(sorted(self._allowed_methods()))
+            })
+        return web.Response(
+            body=path_item.options_body, headers=path_item.options_headers
+        )
+
+    def _content_encoding(self, response: web.StreamResponse,
+                          body_size: T.Optional[int]) -> str:
+        # language=rst
+        """Negotiates the content coding for ``response``.
+
+        Adds ``Accept-Encoding`` to the ``Vary:`` header and, if the body will
+        be compressed, sets the ``Content-Encoding:`` header and makes a strong
+        ``ETag:`` coding-specific (see :func:`_content_coding.coded_etag`).
+
+        Parameters:
+            body_size: the size of the response body, or ``None`` if unknown.
+                Known sizes below :attr:`compression_min_size` are never
+                compressed.
+
+        Returns:
+            The negotiated content coding, possibly ``'identity'``.
+
+        """
+        _content_negotiation._add_vary(response.headers, 'Accept-Encoding')
+        if body_size is not None and body_size < self.compression_min_size:
+            return _content_coding.IDENTITY
+        encoding = _content_negotiation._best_content_encoding(
+            self.request, self._content_encoding_matcher
+        )
+        if encoding != _content_coding.IDENTITY:
+            response.headers[hdrs.CONTENT_ENCODING] = encoding
+            etag = response.headers.get(hdrs.ETAG)
+            if etag is not None:
+                response.headers[hdrs.ETAG] = \
+                    _content_coding.coded_etag(etag, encoding)
+        return encoding
+
+    def _compressobj(self, response: web.StreamResponse,
+                     body_size: T.Optional[int]):
+        # language=rst
+        """Like :meth:`_content_encoding`, but returns a streaming compressor.
+
+        Returns:
+            A streaming compressor (see :func:`_content_coding.compressobj`),
+            or ``None`` if the body must be sent uncompressed.
+
+        """
+        encoding = self._content_encoding(response, body_size)
+        if encoding == _content_coding.IDENTITY:
+            return None
+        return _content_coding.compressobj(encoding, self.compression_level)
+
+    @classmethod
+    def add_serializer(cls, content_type: str,
+                       serializer: T.Callable[['View'], T.Awaitable[T.AsyncIterable[bytes]]]):
+        # language=rst
+        """Registers a serializer for ``content_type`` on this class.
+
+        A serializer is a coroutine function that takes a view and returns an
+        asynchronous iterable of ``bytes`` chunks, which :meth:`get` writes to
+        the response as they are produced.  The registry is inherited by, but
+        not shared with, subclasses.
+
+        Content types are preferred in the order in which they were added.
+        Adding an already registered content type replaces its serializer and
+        makes it the least preferred.
+
+        Example::
+
+            async def csv_serializer(view):
+                async def chunks():
+                    async for row in view.rows():
+                        yield ','.join(row).encode() + b'\\r\\n'
+                return chunks()
+
+            MyView.add_serializer('text/csv; charset=utf-8', csv_serializer)
+
+        """
+        serializers = {
+            key: value for key, value in cls._serializers.items()
+            if key != content_type
+        }
+        serializers[content_type] = serializer
+        cls._serializers = serializers
+        cls._content_type_matcher = \
+            _content_negotiation._ContentTypeMatcher(serializers)
+
+    @property
+    def best_content_type(self) -> str:
+        # language=rst
+        """The registered content type that best matches the request.
+
+        Raises:
+            web.HTTPNotAcceptable: if none of the content types for which a
+                serializer was registered is acceptable to the client.
+
+        """
+        return _content_negotiation._best_content_type(
+            self.request, self._content_type_matcher
+        )
+
+    to_dict = None
+    # language=rst
+    """Optional coroutine method returning the data to serialize as JSON.
+
+    Used by the default JSON serializer, by embedding views and by
+    :class:`~aiohttp_extras.BatchView`.  Views that leave this ``None`` have no
+    JSON representation, and must register serializers of their own (see
+    :meth:`add_serializer`).
+
+    Example::
+
+        async def to_dict(self):
+            return {'id': self['id']}
+
+    """
+
+    batch_load = None
+    # language=rst
+    """Optional class method that loads the data of many views in one call.
+
+    Called as ``await cls.batch_load(request, keys)``, with the request in
+    which the views are rendered, and the distinct :attr:`batch_key`\\s of
+    the views to load.  Returns a mapping from keys to data; keys missing from
+    the mapping make :meth:`batch_loaded` raise :exc:`web.HTTPNotFound`.
+
+    Views that implement it obtain their data through :meth:`batch_loaded`;
+    see :mod:`aiohttp_extras._loader`.
+
+    """
+
+    @property
+    def batch_key(self) -> T.Hashable:
+        # language=rst
+        """The key of this view in :attr:`batch_load`.
+
+        This default implementation returns the value of the only variable
+        in :attr:`match_dict`, or a sorted tuple of its items if the path has
+        more variables.  Subclasses can override this default implementation.
+
+        """
+        match_dict = self.match_dict
+        if len(match_dict) == 1:
+            return next(iter(match_dict.values()))
+        return tuple(sorted(match_dict.items()))
+
+    def batch_loaded(self) -> T.Awaitable:
+        # language=rst
+        """The data of this view, loaded by :attr:`batch_load`.
+
+        All views of this class that call this method, or that were primed,
+        within the same iteration of the event loop are loaded together.
+
+        Only available in views that implement :attr:`batch_load`.
+
+        Raises:
+            web.HTTPNotFound: if :attr:`batch_load` returned no data for this
+                view.
+
+        """
+        assert self.batch_load is not None, \
+            "batch_loaded() requires an implementation of batch_load()."
+        return _loader.batch_loader(self.request, type(self)).load(self.batch_key)
+
+    async def _write_body(self, response: web.StreamResponse,
+                          chunks: T.AsyncIterable[bytes]):
+        # language=rst
+        """Prepares ``response`` and streams ``chunks`` into it.
+
+        If the entire body fits in a single chunk, it is sent with a
+        ``Content-Length:`` header, and only compressed if it's large enough.
+        Otherwise, the body is streamed (and compressed) chunk by chunk, and
+        each write waits for the transport to drain.
+
+        """
+        chunks = chunks.__aiter__()
+        first = await _next_chunk(chunks)
+        second = None if first is None else await _next_chunk(chunks)
+        if second is None:
+            body = b'' if first is None else bytes(first)
+            compressobj = self._compressobj(response, len(body))
+            if compressobj is not None:
+                body = compressobj.compress(body) + compressobj.flush()
+            response.content_length = len(body)
+            await response.prepare(self.request)
+            if len(body) > 0:
+                await response.write(body)
+            return
+        compressobj = self._compressobj(response, None)
+        await response.prepare(self.request)
+
+        async def write(chunk):
+            if compressobj is not None:
+                chunk = compressobj.compress(chunk)
+            if len(chunk) > 0:
+                await response.write(chunk)
+
+        await write(first)
+        await write(second)
+        async for chunk in chunks:
+            await write(chunk)
+        if compressobj is not None:
+            await response.write(compressobj.flush())
+
+    async def _write_representation(
+        self, response: web.StreamResponse, cache_key,
+        representation: _content_coding.Representation
+    ):
+        # language=rst
+        """Prepares ``response`` and writes a cached ``representation``.
+
+        Compressed variants are taken from (and added to)
+        :attr:`representation_cache`.  For ``HEAD`` requests, only the headers
+        are sent.
+
+        """
+        response.headers[hdrs.ETAG] = cache_key[2]
+        encoding = self._content_encoding(response, len(representation.body))
+        body = self.representation_cache.variant(
+            cache_key, representation, encoding
+        )
+        response.content_length = len(body)
+        await response.prepare(self.request)
+        if len(body) > 0 and self.request.method != hdrs.METH_HEAD:
+            await response.write(body)
+
+    def _cache_key(self, response: web.StreamResponse):
+        # language=rst
+        """The key of this response in :attr:`representation_cache`, if any."""
+        etag = response.headers.get(hdrs.ETAG)
+        if self.representation_cache is None or etag is None:
+            return None
+        return (
+            str(self.canonical_rel_url), response.headers[hdrs.CONTENT_TYPE],
+            etag
+        )
+
+    def _regenerate(self, serializer) \
+            -> T.Callable[[], T.Awaitable[T.AsyncIterable[bytes]]]:
+        # language=rst
+        """A coroutine function that regenerates the body, in the background.
+
+        See :attr:`stale_while_revalidate`.  The body is generated by a fresh
+        view, for a clone of the request, so that nothing of this view or its
+        request is used after the response was sent.
+
+        """
+        request = self.request.clone()
+        # Clones share a copy of the request-scoped state; drop it:
+        for key in list(request):
+            del request[key]
+        view_class = type(self)
+
+        async def generate():
+            return await serializer(view_class(request))
+        return generate
+
+    def _validate_response(self, chunks: T.AsyncIterable[bytes],
+                           content_type: str) -> T.AsyncIterable[bytes]:
+        # language=rst
+        """Wraps ``chunks`` for validation; see :attr:`response_validation_rate`."""
+        media_type = content_type.split(';', 1)[0].strip()
+        if media_type != 'application/json' and not media_type.endswith('+json'):
+            return chunks
+        path_item = self._path_item()
+        operation = None if path_item is None \
+            else path_item.operation(hdrs.METH_GET)
+        node = None if operation is None \
+            else operation.response_schemas.get('200')
+        if node is None:
+            return chunks
+
+        def on_result(error):
+            sink = self.response_validation_sink
+            if sink is not None:
+                try:
+                    sink(self, error)
+                except Exception:
+                    _logger.exception("Response validation sink failed")
+            elif isinstance(error, _validation.ValidationError):
+                _logger.warning(
+                    "Response for %s doesn't match its schema: %s",
+                    self.canonical_rel_url, error
+                )
+            elif error is not None:
+                _logger.error(
+                    "Couldn't validate response for %s",
+                    self.canonical_rel_url, exc_info=error
+                )
+        return _validation.validate_stream(chunks, node, on_result)
+
+    def _cache_control(self) -> T.Optional[str]:
+        # language=rst
+        """The RFC 5861 ``Cache-Control:`` extensions for this view, if any."""
+        directives = []
+        if self.stale_while_revalidate is not None:
+            directives.append(
+                'stale-while-revalidate=%d' % self.stale_while_revalidate
+            )
+        if self.stale_if_error is not None:
+            directives.append('stale-if-error=%d' % self.stale_if_error)
+        return ', '.join(directives) if len(directives) > 0 else None
+
+    async def _init_response(self, content_type: T.Optional[str]=None) \
+            -> web.StreamResponse:
+        # language=rst
+        """Creates a response with all headers that don't depend on the body.
+
+        Used by both :meth:`get` and :meth:`head`, so that :meth:`etag` and
+        content negotiation run only once per request.
+
+        Parameters:
+            content_type: a registered content type, to use instead of the
+                negotiated :attr:`best_content_type`.
+
+        """
+        response = web.StreamResponse()
+        response.headers[hdrs.CONTENT_TYPE] = self.best_content_type \
+            if content_type is None else content_type
+        etag = await self.etag() if hasattr(self, 'etag') else None
+        if isinstance(etag, str):
+            response.headers[hdrs.ETAG] = etag
+        if self.rel_url is self.request.rel_url:
+            add_content_location = not self._canonical_query.is_canonical
+        else:
+            add_content_location = \
+                str(self.canonical_rel_url) != str(self.request.rel_url)
+        if add_content_location:
+            response.headers[hdrs.CONTENT_LOCATION] = str(self.canonical_rel_url)
+        return response
+
     async def get(self) -> web.StreamResponse:
         if _GET_IN_PROGRESS in self.request:
             raise web.HTTPInternalServerError()
         self.request[_GET_IN_PROGRESS] = True
+        try:
+            response = await self._init_response()
+            content_type = response.headers[hdrs.CONTENT_TYPE]
+            serializer = self._serializers[content_type]
+            cache = self.representation_cache
+            cache_key = self._cache_key(response)
 
-        if self.request.method == 'GET':
-            data = await self.to_json()
-        response = web.StreamResponse()
-        if isinstance(await self.etag(), str):
-            response.headers.add('ETag', await self.etag())
-        response.content_type = self.best_content_type
-        response.enable_compression()
-        if str(self.canonical_rel_url) != str(self.request.rel_url):
-            response.headers.add('Content-Location', str(self.canonical_rel_url))
-        await response.prepare(self.request)
-        if self.request.method == 'GET':
-            pass  # TODO: implement.
-        response.write_eof()
-        del self.request[_GET_IN_PROGRESS]
-        return response
+            async def generate():
+                chunks = await serializer(self)
+                if cache_key is not None:
+                    chunks = cache.tee(cache_key, chunks, self.compression_level)
+                if self.response_validation_rate > 0.0 and \
+                        random.random() < self.response_validation_rate:
+                    chunks = self._validate_response(chunks, content_type)
+                return chunks
 
-    async def head(self):
-        return await self.get()
+            if cache_key is not None:
+                cache_control = self._cache_control()
+                if cache_control is not None:
+                    response.headers[hdrs.CACHE_CONTROL] = cache_control
+                stale = None
+                representation = cache.get(cache_key)
+                if representation is None and \
+                        self.stale_while_revalidate is not None:
+                    stale = cache.stale(cache_key, self.stale_while_revalidate)
+                if stale is not None:
+                    cache.revalidate(
+                        cache_key, self._regenerate(serializer),
+                        self.compression_level
+                    )
+                    await self._write_representation(response, *stale)
+                    await response.write_eof()
+                    return response
+                if representation is not None:
+                    await self._write_representation(
+                        response, cache_key, representation
+                    )
+                    await response.write_eof()
+                    return response
 
+            try:
+                if not self.coalesce_requests:
+                    await self._write_body(response, await generate())
+                else:
+                    # Compression happens per response, in :meth:`_write_body`,
+                    # because each request negotiates its own content coding.
+                    chunks = self._flights.subscribe(
+                        (str(self.canonical_rel_url), content_type,
+                         self.request.headers.get(hdrs.AUTHORIZATION)),
+                        generate
+                    )
+                    try:
+                        await self._write_body(response, chunks)
+                    finally:
+                        chunks.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if response.prepared or cache_key is None or \
+                        self.stale_if_error is None or \
+                        isinstance(e, web.HTTPException) and e.status < 500:
+                    raise
+                stale = cache.stale(cache_key, self.stale_if_error)
+                if stale is None:
+                    raise
+                _logger.exception(
+                    "Serving stale representation of %s", cache_key[0]
+                )
+                await self._write_representation(response, *stale)
+            await response.write_eof()
+            return response
+        finally:
+            del self.request[_GET_IN_PROGRESS]
+
+    async def _json_representation(self) -> T.Tuple[T.Optional[str], bytes]:
+        # language=rst
+        """The ``application/json`` representation that :meth:`get` would send.
+
+        Uses the same :meth:`etag`, serializer and :attr:`representation_cache`
+        as :meth:`get`, but skips content negotiation, content coding, and
+        conditional request handling.  The whole body is kept in memory.
+
+        Returns:
+            A tuple ``(etag, body)``, where ``etag`` may be ``None``.
+
+        Raises:
+            web.HTTPNotAcceptable: if this view has no JSON representation.
+
+        """
+        serializer = self._serializers.get(_JSON_CONTENT_TYPE)
+        if serializer is None:
+            raise web.HTTPNotAcceptable()
+        response = await self._init_response(_JSON_CONTENT_TYPE)
+        etag = response.headers.get(hdrs.ETAG)
+        cache_key = self._cache_key(response)
+        if cache_key is not None:
+            representation = self.representation_cache.get(cache_key)
+            if representation is not None:
+                return etag, representation.body
+        chunks = await serializer(self)
+        if cache_key is not None:
+            chunks = self.representation_cache.tee(
+                cache_key, chunks, self.compression_level
+            )
+        body = bytearray()
+        async for chunk in chunks:
+            body.extend(chunk)
+        return etag, bytes(body)
+
+    async def head(self) -> web.StreamResponse:
+        # language=rst
+        """Like :meth:`get`, but computes only the response headers.
+
+        No serializer is invoked, so no representation is built.  If
+        :attr:`representation_cache` holds the representation that :meth:`get`
+        would send, the ``Content-Length:``, ``Content-Encoding:`` and
+        ``ETag:`` headers are taken from it, so that they match those of
+        :meth:`get`.  Otherwise the body size is unknown: ``Content-Length:``
+        is omitted, and the content coding is negotiated as :meth:`get` does
+        for a body of unknown size, i.e. as if the body weren't smaller than
+        :attr:`compression_min_size`.
+
+        """
+        response = await self._init_response()
+        cache_key = self._cache_key(response)
+        if cache_key is not None:
+            cache = self.representation_cache
+            cache_control = self._cache_control()
+            if cache_control is not None:
+                response.headers[hdrs.CACHE_CONTROL] = cache_control
+            representation = cache.get(cache_key)
+            if representation is None and \
+                    self.stale_while_revalidate is not None:
+                stale = cache.stale(cache_key, self.stale_while_revalidate)
+                if stale is not None:
+                    cache_key, representation = stale
+            if representation is not None:
+                await self._write_representation(
+                    response, cache_key, representation
+                )
+                await response.write_eof()
+                return response
+        self._content_encoding(response, None)
+        await response.prepare(self.request)
+        await response.write_eof()
+        return response
@@ -9,11 +9,14 @@ from aiohttp import web
 from ._parse_embed import *
 from ... import (
     _json,
+    _loader,
     _view
 )
 
 _logger = logging.getLogger(__name__)
 
+_EMBED_CACHE_SIZE = 256
+
 
 async def _hal_json_serializer(view) -> collections.AsyncIterable:
     # language=rst
@@ -25,7 +28,21 @@ async def _hal_json_serializer(view) -> collections.AsyncIterable:
     """
     assert isinstance(view, _view.View), "Parameter 'view' must have type _view.View."
     assert isinstance(view, HALJSONMixin)
-    return _json.encode(await view.to_dict())
+    return _json.encode(
+        await view.to_dict(), max_concurrency=view.embed_concurrency
+    )
+
+
+def _prime(views: T.Iterable):
+    # language=rst
+    """Primes the batch loaders of the ``views`` that implement one.
+
+    See :attr:`View.batch_load <aiohttp_extras.View.batch_load>`.
+
+    """
+    for view in views:
+        if isinstance(view, _view.View) and view.batch_load is not None:
+            _loader.batch_loader(view.request, type(view)).prime(view.batch_key)
 
 
 class HALJSONMixin(object):
@@ -37,7 +54,24 @@ class HALJSONMixin(object):
 
     """
 
-    def __init_subclass__(cls):
+    embed_max_depth = MAX_EMBED_DEPTH
+    # language=rst
+    """Maximum nesting depth of the ``embed`` query parameter."""
+
+    embed_max_width = MAX_EMBED_WIDTH
+    # language=rst
+    """Maximum number of link relations at one level of ``embed``."""
+
+    embed_max_length = MAX_EMBED_LENGTH
+    # language=rst
+    """Maximum length of the ``embed`` query parameter."""
+
+    _parsed_embeds = collections.OrderedDict()
+
+    __embed = None
+    __link_values = None
+
+    def __init_subclass__(cls, **kwargs):
         """
 
 
@@ -46,22 +80,55 @@ class HALJSONMixin(object):
         :python:meth:`object.__init_subclass` for details.
 
         """
-        super().__init_subclass__()
-        assert isinstance(cls, _view.View)
+        super().__init_subclass__(**kwargs)
+        assert issubclass(cls, _view.View)
+        cls._parsed_embeds = collections.OrderedDict()
         cls.add_serializer('application/hal+json; charset=utf-8', _hal_json_serializer)
         cls.add_serializer('application/json; charset=utf-8', _hal_json_serializer)
 
     def add_embed_to_url(self, url: web.URL, link_relation):
         embed = self.embed.get(link_relation)
-        if embed is None:
+        if embed is None or len(embed) == 0:
             return url
-        return url.update_query(embed=embed)
+        return url.update_query(embed=to_string(embed))
+
+    @classmethod
+    def _lookup_embed(cls, embed: str) -> T.Mapping[str, T.Mapping]:
+        # language=rst
+        """Returns the parsed ``embed`` query parameter.
+
+        Results are kept in a bounded LRU cache per view class, keyed by the
+        raw parameter.
+
+        """
+        cache = cls._parsed_embeds
+        result = cache.get(embed)
+        if result is not None:
+            cache.move_to_end(embed)
+            return result
+        result = parse_embed(
+            embed, cls.embed_max_depth, cls.embed_max_width,
+            cls.embed_max_length
+        )
+        cache[embed] = result
+        if len(cache) > _EMBED_CACHE_SIZE:
+            cache.popitem(last=False)
+        return result
 
     @property
-    def embed(self):
+    def embed(self) -> T.Mapping[str, T.Mapping]:
+        # language=rst
+        """The parsed ``embed`` query parameter; see :func:`parse_embed`.
+
+        Raises:
+            web.HTTPBadRequest: if the parameter is malformed, or exceeds
+                :attr:`embed_max_depth`, :attr:`embed_max_width` or
+                :attr:`embed_max_length`.
+
+        """
         if self.__embed is None:
             embed = ','.join(self.query.getall('embed', default=''))
-            self.__embed = parse_embed(embed)
+            self.__embed = self._lookup_embed(embed)
         return self.__embed
 
     async def to_dict(self):
@@ -157,18 +224,62 @@ class HALJSONMixin(object):
             -   a `.View` object
             -   a *link object*
             -   Iterable of `.View`\s and/or *link objects* (may be mixed)
+            -   a callable or awaitable producing one of the above, or
+                ``None`` to omit the relation
 
             where *link object* means a HALJSON link object, ie. a `dict` with
             at least a key ``href``.
 
+        Callables and awaitables are evaluated lazily, only when the relation
+        is rendered, and at most once per view.  This method itself is called
+        at most once per view.
+
+        Example::
+
+            async def _links(self):
+                return {
+                    'owner': Owner.from_match(self.request, {'id': self['owner']}),
+                    # Evaluated at most once, when rendered:
+                    'item': self.members
+                }
+
         """
         return {}
 
+    async def _link_values(self) -> T.Dict[str, T.Any]:
+        # language=rst
+        """The result of :meth:`_links`, computed once per view."""
+        if self.__link_values is None:
+            self.__link_values = dict(await self._links())
+        return self.__link_values
+
+    async def _link_value(self, relation: str) -> T.Any:
+        # language=rst
+        """The value of ``relation`` in :meth:`_links`.
+
+        Lazy values are evaluated on first access, and replaced by their
+        result.
+
+        """
+        values = await self._link_values()
+        value = values[relation]
+        # Views are awaitable, but not lazy:
+        if isinstance(value, _view.View):
+            return value
+        if callable(value):
+            value = value()
+        if inspect.isawaitable(value) and not isinstance(value, _view.View):
+            value = await value
+        values[relation] = value
+        return value
+
     async def embedded(self) -> T.Dict[str, T.Any]:
         result = {}
-        _links = await self._links()
-        for key, value in _links.items():
+        for key in list(await self._link_values()):
             if key in self.embed:
+                value = await self._link_value(key)
+                if value is None:
+                    continue
                 if (
                     inspect.isasyncgen(value) or
                     inspect.isgenerator(value) or
@@ -176,16 +287,22 @@ class HALJSONMixin(object):
                     isinstance(value, collections.abc.Iterable)
                 ):
                     result[key] = value
+                    # Views from generators can't be primed without consuming
+                    # them early; they're batched per `embed_concurrency`:
+                    if isinstance(value, _view.View):
+                        _prime((value,))
+                    elif isinstance(value, collections.abc.Sequence):
+                        _prime(value)
                 else:
                     _logger.error("Don't know how to embed object: %s", value)
         return result
 
     async def links(self) -> T.Dict[str, T.Any]:
         result = {}
-        _links = await self._links()
-        for key, value in _links.items():
-            if key == 'item':
-                key = 'item'
+        for key in list(await self._link_values()):
+            value = await self._link_value(key)
+            if value is None:
+                continue
             if isinstance(value, _view.View):
                 if key not in self.embed:
                     result[key] = value.to_link
@@ -201,7 +318,7 @@ class HALJSONMixin(object):
                         for resource in resources:
                             yield resource.to_link
                     result[key] = g2(value)
-            elif isinstance(value, collections.Mapping):
+            elif isinstance(value, collections.abc.Mapping):
                 if key in self.embed:
                     _logger.info('Client asked to embed unembeddable object: %s', value)
                 result[key] = value
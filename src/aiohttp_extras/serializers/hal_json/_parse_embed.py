@@ -0,0 +1,148 @@
+"""Parser for the 'embed=...' query parameter."""
+
+import re
+import logging
+import types
+import typing as T
+
+from aiohttp import web
+
+_logger = logging.getLogger(__name__)
+
+
+_IDENTIFIER = re.compile(r'[a-z_]\w*', flags=re.IGNORECASE)
+_EMPTY = types.MappingProxyType({})
+
+MAX_EMBED_LENGTH = 4096
+# language=rst
+"""Default maximum length of the ``embed`` query parameter."""
+
+MAX_EMBED_DEPTH = 8
+# language=rst
+"""Default maximum nesting depth of the ``embed`` query parameter."""
+
+MAX_EMBED_WIDTH = 64
+# language=rst
+"""Default maximum number of link relations within one pair of parentheses."""
+
+
+def parse_embed(embed: str, max_depth: int=MAX_EMBED_DEPTH,
+                max_width: int=MAX_EMBED_WIDTH,
+                max_length: int=MAX_EMBED_LENGTH) -> T.Mapping[str, T.Mapping]:
+    # language=rst
+    """Parser for the ``embed`` query parameter.
+
+    The parameter is parsed in a single pass, in time linear in its length.
+    The result is immutable, so that it can be cached and shared between
+    requests.
+
+    Example:
+
+        >>> parse_embed('foo(bar,baz),bar')
+        {'foo': {'bar': {}, 'baz': {}}, 'bar': {}}
+
+    Parameters:
+        embed: the value of the ``embed`` query parameter.
+        max_depth: the maximum nesting depth; ``'foo(bar)'`` has depth 2.
+        max_width: the maximum number of link relations at any one level.
+        max_length: the maximum length of ``embed``.
+
+    Raises:
+        web.HTTPBadRequest: if a syntax error is detected, or if one of the
+            limits is exceeded.
+
+    """
+    if len(embed) > max_length:
+        raise web.HTTPBadRequest(
+            text="Query parameter 'embed' is longer than %d characters" % max_length
+        )
+    result = {}
+    # The dicts of all levels that are still open:
+    stack = [result]
+    current = None
+    pos, end = 0, len(embed)
+    while pos < end:
+        char = embed[pos]
+        if char == '(':
+            if current is None:
+                raise web.HTTPBadRequest(
+                    text="Unexpected opening parenthesis in query parameter 'embed' at position %d" % pos
+                )
+            if len(stack) >= max_depth:
+                raise web.HTTPBadRequest(
+                    text="Query parameter 'embed' is nested more than %d levels deep" % max_depth
+                )
+            level = {}
+            stack[-1][current] = types.MappingProxyType(level)
+            stack.append(level)
+            current = None
+            pos += 1
+            continue
+        if char == ',':
+            pos += 1
+            # A comma can only precede an identifier, a closing parenthesis,
+            # or the end of the parameter:
+            if pos == end or embed[pos] == ')':
+                continue
+            match = _IDENTIFIER.match(embed, pos)
+            if match is None:
+                raise web.HTTPBadRequest(
+                    text="Syntax error in query parameter 'embed' at position %d" % pos
+                )
+        elif char == ')':
+            if len(stack) == 1:
+                raise web.HTTPBadRequest(
+                    text="Unmatched closing parenthesis in query parameter 'embed' at position %d" % pos
+                )
+            stack.pop()
+            current = None
+            pos += 1
+            continue
+        else:
+            match = _IDENTIFIER.match(embed, pos)
+            if match is None:
+                raise web.HTTPBadRequest(
+                    text="Syntax error in query parameter 'embed' at position %d" % pos
+                )
+        token = match.group()
+        level = stack[-1]
+        if token in level:
+            raise web.HTTPBadRequest(
+                text="Link relation '%s' mentioned more than once in query parameter 'embed' at position %d" % (token, pos)
+            )
+        if token == 'self':
+            raise web.HTTPBadRequest(text="Link relation 'self' can not be embedded")
+        if len(level) >= max_width:
+            raise web.HTTPBadRequest(
+                text="More than %d link relations at one level of query parameter 'embed'" % max_width
+            )
+        level[token] = _EMPTY
+        current = token
+        pos = match.end()
+    if len(stack) > 1:
+        raise web.HTTPBadRequest(
+            text="Unmatched opening parenthesis in query parameter 'embed'"
+        )
+    return types.MappingProxyType(result)
+
+
+def to_string(embed: T.Mapping[str, T.Mapping]) -> str:
+    # language=rst
+    """Serializer for the ``embed`` query parameter.
+
+    Given the output of :func:`parse_embed`, this method serializes back to the
+    query parameter string::
+
+        >>> parse_embed(to_string(some_embed_dict)) == some_embed_dict
+        True
+
+    """
+    def to_string_recursive(embed):
+        if len(embed) == 0:
+            return ''
+        return '(' + ','.join(
+            key + to_string_recursive(value) for key, value in embed.items()
+        ) + ')'
+    return ','.join(
+        key + to_string_recursive(value) for key, value in embed.items()
+    )
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+import aiohttp_extras
+from aiohttp_extras.serializers.hal_json import HALJSONMixin
+
+
+@pytest.fixture()
+def app():
+    class Item(aiohttp_extras.View):
+        batchable = True
+        running = [0]
+        max_running = [0]
+
+        async def etag(self):
+            return '"%s"' % self['id']
+
+        async def to_dict(self):
+            if self['id'] == 'missing':
+                raise web.HTTPNotFound()
+            self.running[0] += 1
+            self.max_running[0] = max(self.max_running[0], self.running[0])
+            await asyncio.sleep(0.01)
+            self.running[0] -= 1
+            return {'id': self['id'], 'query': dict(self.query)}
+
+    class Batch(aiohttp_extras.BatchView):
+        max_concurrency = 3
+
+    class Secret(aiohttp_extras.View):
+        async def to_dict(self):
+            return {'secret': True}
+
+    class Tag(HALJSONMixin, aiohttp_extras.View):
+        batchable = True
+        batches = []
+
+        @classmethod
+        async def batch_load(cls, request, keys):
+            cls.batches.append(keys)
+            return {key: {'name': key.upper()} for key in keys}
+
+        async def attributes(self):
+            return dict(await self.batch_loaded())
+
+    application = web.Application()
+    Item.add_to_router(application.router, '/items/{id}')
+    Secret.add_to_router(application.router, '/secret')
+    Tag.add_to_router(application.router, '/tags/{tag}')
+    Batch.add_to_router(application.router, '/batch')
+    application['item'] = Item
+    application['tag'] = Tag
+    return application
+
+
+@pytest.fixture()
+def client(loop, app, test_client):
+    return loop.run_until_complete(test_client(app))
+
+
+async def test_batch(client, app):
+    urls = ['/items/%d?x=%d' % (i, i) for i in range(10)]
+    urls += ['/items/missing', '/nothing', '/batch', '/secret']
+    response = await client.post('/batch', json=urls)
+    assert response.status == 200
+    results = await response.json()
+    assert [r['href'] for r in results] == urls
+    for i, result in enumerate(results[:10]):
+        assert result == {
+            'href': urls[i],
+            'status': 200,
+            'etag': '"%d"' % i,
+            'body': {'id': str(i), 'query': {'x': str(i)}},
+        }
+    assert [r['status'] for r in results[10:]] == [404, 404, 404, 404]
+    assert app['item'].max_running[0] == 3
+
+
+async def test_batch_renders_like_get(client, app):
+    urls = ['/tags/a', '/tags/b', '/tags/c']
+    response = await client.post('/batch', json=urls)
+    results = await response.json()
+    # All views in the batch were loaded in a single call:
+    assert app['tag'].batches == [['a', 'b', 'c']]
+    for url, result in zip(urls, results):
+        assert result['status'] == 200
+        # HAL views include their _links, as in a GET:
+        get = await client.get(url, headers={'Accept': 'application/json'})
+        assert result['body'] == await get.json()
+        assert result['body']['_links']['self']['href'] == url
+
+
+async def test_batch_rejects_absolute_urls(client):
+    urls = ['http://evil.example/items/1', '//x/items/2', 'items/3', '/items/4']
+    response = await client.post('/batch', json=urls)
+    assert [r['status'] for r in await response.json()] == [400, 400, 400, 200]
+
+
+async def test_batch_errors(client):
+    response = await client.post('/batch', data=b'not json')
+    assert response.status == 400
+    response = await client.post('/batch', json={'foo': 'bar'})
+    assert response.status == 400
+    response = await client.post('/batch', json=[])
+    assert await response.json() == []
+    response = await client.get('/batch')
+    assert response.status == 405
+    assert response.headers['Allow'] == 'OPTIONS,POST'
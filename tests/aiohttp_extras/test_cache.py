@@ -0,0 +1,42 @@
+from aiohttp_extras import _cache, _content_coding
+
+
+def _representation(size, etag='"1"'):
+    return _content_coding.Representation(b'x' * size, 'text/plain', etag)
+
+
+def test_representation_cache_evicts_least_recently_used():
+    cache = _cache.RepresentationCache(max_bytes=300, max_entry_bytes=200)
+    for name in 'abc':
+        cache.put(('/' + name, 'text/plain', '"1"'), _representation(100))
+    assert cache.nbytes == 300
+    assert cache.get(('/a', 'text/plain', '"1"')) is not None
+    cache.put(('/d', 'text/plain', '"1"'), _representation(100))
+    assert cache.get(('/b', 'text/plain', '"1"')) is None
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+    cache.put(('/e', 'text/plain', '"1"'), _representation(201))
+    assert len(cache) == 3
+
+
+def test_representation_cache_accounts_for_variants():
+    cache = _cache.RepresentationCache(max_bytes=1000)
+    key = ('/a', 'text/plain', '"1"')
+    representation = _representation(200)
+    cache.put(key, representation)
+    compressed = cache.variant(key, representation, 'gzip')
+    assert cache.nbytes == 200 + len(compressed)
+
+
+async def test_tee_caches_complete_bodies_only(loop):
+    cache = _cache.RepresentationCache(max_bytes=1000, max_entry_bytes=10)
+
+    async def chunks(*values):
+        for value in values:
+            yield value
+
+    key = ('/small', 'text/plain', '"1"')
+    assert [c async for c in cache.tee(key, chunks(b'ab', b'cd'))] == [b'ab', b'cd']
+    assert cache.get(key).body == b'abcd'
+    key = ('/large', 'text/plain', '"1"')
+    assert len([c async for c in cache.tee(key, chunks(b'x' * 8, b'x' * 8))]) == 2
+    assert cache.get(key) is None
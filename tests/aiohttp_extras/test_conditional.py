@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from aiohttp_extras import _conditional
+
+
+def test_collection_etag_is_order_independent():
+    members = {str(i): _conditional.etag_from_int(i) for i in range(200)}
+    keys = list(members)
+    random.shuffle(keys)
+    shuffled = _conditional.CollectionETag()
+    for key in keys:
+        shuffled[key] = members[key]
+    assert shuffled.etag == _conditional.CollectionETag(members).etag
+    assert list(shuffled) == sorted(members)
+    assert len(shuffled) == 200
+
+
+def test_collection_etag_incremental_updates():
+    collection_etag = _conditional.CollectionETag({
+        'alice': '"1"',
+        'bob': '"2"',
+    })
+    original = collection_etag.etag
+    collection_etag['bob'] = '"3"'
+    assert collection_etag.etag != original
+    collection_etag['bob'] = '"2"'
+    assert collection_etag.etag == original
+    collection_etag['carol'] = '"4"'
+    del collection_etag['carol']
+    assert collection_etag.etag == original
+    assert collection_etag['alice'] == '"1"'
+    with pytest.raises(KeyError):
+        del collection_etag['carol']
+    del collection_etag['alice']
+    del collection_etag['bob']
+    assert collection_etag.etag == _conditional.CollectionETag().etag
+
+
+@pytest.mark.parametrize('header', [
+    '"foo"', ' "foo"', 'W/"foo"', '"foo", "bar"', 'W/"foo",W/"bar"', '"f,o"',
+    '""', '"foo" ', '"fo"o"', 'foo', '"fo o"', 'W/ "foo"', '"foo\x7f"',
+    '"caf\xe9"', '"\u20ac"',
+])
+def test_parse_etags_fast_path_agrees_with_regex(header):
+    if _conditional._ETAGS_PATTERN.fullmatch(header):
+        expected = frozenset(
+            match[1] for match in _conditional._ETAG_ITER_PATTERN.finditer(header)
+        )
+        assert _conditional._parse_etags(header) == expected
+    else:
+        assert _conditional._parse_single_etag(header) is None
+        with pytest.raises(_conditional.web.HTTPBadRequest):
+            _conditional._parse_etags(header)
+
+
+async def test_etag_of_matches_etag_generator(loop):
+    small = {'foo': [1, 2, 3]}
+    large = list(range(_conditional._ETAG_EXECUTOR_THRESHOLD))
+    expected = _conditional.ETagGenerator(small, large).etag
+    assert await _conditional.etag_of(small, large) == expected
+
+
+def test_size_at_least_counts_nested_elements():
+    assert _conditional._size_at_least({'rows': list(range(100))}, 100)
+    assert _conditional._size_at_least([['x' * 60], {'y': 'z' * 40}], 100)
+    assert not _conditional._size_at_least({'rows': [1, 2, 3]}, 100)
+    assert not _conditional._size_at_least(42, 2)
+
+
+def test_match_coded_etags():
+    assert _conditional._match_etags('"abc"', {'"abc-gzip"'}, False)
+    assert _conditional._match_etags('"abc"', {'W/"abc-br"'}, True)
+    assert _conditional._match_etags('"abc"', {'"abc-zstd"'}, False)
+    assert not _conditional._match_etags('"abc"', {'"abc-foo"'}, False)
+    assert not _conditional._match_etags('W/"abc"', {'W/"abc-gzip"'}, True)
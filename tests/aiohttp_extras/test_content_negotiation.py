@@ -0,0 +1,77 @@
+import gzip
+
+import pytest
+from aiohttp import web
+from multidict import CIMultiDict
+
+from aiohttp_extras import _content_coding, _content_negotiation
+
+AVAILABLE = [
+    'application/hal+json; charset=utf-8',
+    'application/json; charset=utf-8',
+    'text/html; charset=utf-8',
+]
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('*/*', AVAILABLE[0]),
+    ('application/json', AVAILABLE[1]),
+    ('text/*, application/*;q=0.5', AVAILABLE[2]),
+    ('application/*;q=0.1, application/json', AVAILABLE[1]),
+    ('application/json;q=0.5, application/hal+json;q=0.5', AVAILABLE[0]),
+    ('*/*;q=0.2, application/hal+json;q=0', AVAILABLE[1]),
+    ('application/json; charset=UTF-8', AVAILABLE[1]),
+    ('application/json; charset=latin1', None),
+    ('image/png', None),
+    ('text/html;level=1;q=1', None),
+])
+def test_best_match(accept, expected):
+    matcher = _content_negotiation._ContentTypeMatcher(AVAILABLE)
+    assert matcher.best_match(accept) == expected
+
+
+@pytest.mark.parametrize('accept', [
+    'application', 'text/html;q=2', 'text/html;q=foo', '*/html',
+])
+def test_malformed_accept(accept):
+    matcher = _content_negotiation._ContentTypeMatcher(AVAILABLE)
+    with pytest.raises(web.HTTPBadRequest):
+        matcher.best_match(accept)
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('', 'identity'),
+    ('gzip', 'gzip'),
+    ('x-gzip', 'gzip'),
+    ('gzip;q=0.5, identity', 'identity'),
+    ('deflate', 'identity'),
+    ('*', 'gzip'),
+    ('*;q=0', 'identity'),
+    ('gzip;q=0, *', 'identity'),
+])
+def test_best_content_encoding(accept_encoding, expected):
+    matcher = _content_negotiation._ContentEncodingMatcher(['gzip'])
+    assert matcher.best_match(accept_encoding) == expected
+
+
+def test_add_vary():
+    headers = CIMultiDict()
+    _content_negotiation._add_vary(headers, 'Accept-Encoding')
+    _content_negotiation._add_vary(headers, 'Accept')
+    _content_negotiation._add_vary(headers, 'accept-encoding')
+    assert headers['Vary'] == 'Accept-Encoding, Accept'
+
+
+@pytest.mark.parametrize('encoding', _content_coding.AVAILABLE_CONTENT_ENCODINGS)
+def test_representation_variants(encoding):
+    body = b'{"foo": "bar"}' * 100
+    representation = _content_coding.Representation(body, 'application/json')
+    variant = representation.variant(encoding)
+    assert representation.variant(encoding) is variant
+    if encoding == 'gzip':
+        assert gzip.decompress(variant) == body
+    if encoding == 'identity':
+        assert variant == body
+    assert representation.nbytes == len(body) + (
+        0 if encoding == 'identity' else len(variant)
+    )
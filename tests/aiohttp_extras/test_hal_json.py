@@ -0,0 +1,134 @@
+import asyncio
+import collections
+
+import pytest
+from aiohttp import web
+
+import aiohttp_extras
+from aiohttp_extras.serializers.hal_json import HALJSONMixin
+
+
+@pytest.fixture()
+def app():
+    class Member(HALJSONMixin, aiohttp_extras.View):
+        active = 0
+        max_active = 0
+
+        async def attributes(self):
+            cls = type(self)
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+            try:
+                # Later members take less time, so they finish first:
+                await asyncio.sleep(0.001 * (20 - int(self['id'])))
+            finally:
+                cls.active -= 1
+            if self['id'] == '13':
+                raise web.HTTPNotFound()
+            return {'id': self['id']}
+
+    class Members(HALJSONMixin, aiohttp_extras.View):
+        embed_concurrency = 4
+        calls = collections.Counter()
+
+        async def _links(self):
+            self.calls['_links'] += 1
+            return {
+                'item': lambda: [
+                    Member.from_match(self.request, {'id': str(i)})
+                    for i in range(20)
+                ],
+                'describedby': self.describedby,
+                'nothing': lambda: None,
+            }
+
+        async def describedby(self):
+            self.calls['describedby'] += 1
+            return {'href': '/about'}
+
+    class Tag(HALJSONMixin, aiohttp_extras.View):
+        batches = []
+
+        @classmethod
+        async def batch_load(cls, request, keys):
+            cls.batches.append(keys)
+            await asyncio.sleep(0)
+            return {key: {'name': key.upper()} for key in keys if key != 'c'}
+
+        async def attributes(self):
+            return dict(await self.batch_loaded())
+
+    class Tags(HALJSONMixin, aiohttp_extras.View):
+        embed_concurrency = 2
+
+        async def _links(self):
+            return {
+                'item': [
+                    Tag.from_match(self.request, {'tag': tag})
+                    for tag in ('a', 'b', 'c', 'a', 'd', 'e')
+                ]
+            }
+
+    application = web.Application()
+    Member.add_to_router(application.router, '/members/{id}')
+    Members.add_to_router(application.router, '/members')
+    Tag.add_to_router(application.router, '/tags/{tag}')
+    Tags.add_to_router(application.router, '/tags')
+    application['views'] = {
+        'member': Member, 'members': Members, 'tag': Tag, 'tags': Tags
+    }
+    return application
+
+
+@pytest.fixture()
+def client(loop, app, test_client):
+    return loop.run_until_complete(test_client(app))
+
+
+async def test_embedded_views_resolved_concurrently(client, app):
+    response = await client.get('/members?embed=item')
+    assert response.status == 200
+    assert response.headers['Content-Type'] == 'application/hal+json; charset=utf-8'
+    data = await response.json(content_type=None)
+    items = data['_embedded']['item']
+    assert [item['_links']['self']['href'] for item in items] == [
+        '/members/%d' % i for i in range(20)
+    ]
+    assert [item.get('id') for item in items] == [
+        str(i) if i != 13 else None for i in range(20)
+    ]
+    assert items[13]['_status'] == 404
+    assert app['views']['member'].max_active == 4
+
+
+async def test_links_without_embedding(client, app):
+    response = await client.get('/members')
+    data = await response.json(content_type=None)
+    assert '_embedded' not in data
+    assert data['_links']['item'][0] == {'href': '/members/0', 'name': '0'}
+    assert data['_links']['describedby'] == {'href': '/about'}
+    assert 'nothing' not in data['_links']
+    assert app['views']['member'].max_active == 0
+    # Links are computed, and lazy values evaluated, once per view:
+    assert app['views']['members'].calls == {'_links': 1, 'describedby': 1}
+
+
+async def test_embedded_views_batch_loaded(client, app):
+    response = await client.get('/tags?embed=item')
+    data = await response.json(content_type=None)
+    items = data['_embedded']['item']
+    assert [item.get('name') for item in items] == ['A', 'B', None, 'A', 'D', 'E']
+    assert items[2]['_status'] == 404
+    # All embedded tags were primed, and loaded in one call:
+    assert app['views']['tag'].batches == [['a', 'b', 'c', 'd', 'e']]
+
+
+async def test_embed_limits(client, app):
+    view_class = app['views']['members']
+    response = await client.get('/members?embed=item(a(b))')
+    assert response.status == 200
+    assert list(view_class._parsed_embeds) == ['item(a(b))']
+    view_class.embed_max_depth = 2
+    view_class._parsed_embeds.clear()
+    response = await client.get('/members?embed=item(a(b))')
+    assert response.status == 400
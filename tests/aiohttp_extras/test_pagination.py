@@ -0,0 +1,106 @@
+import pytest
+from aiohttp import web
+
+import aiohttp_extras
+from aiohttp_extras import _pagination
+
+_ITEMS = list(range(0, 50, 2))
+
+
+@pytest.fixture()
+def app():
+    class Numbers(aiohttp_extras.KeysetPaginationMixin, aiohttp_extras.View):
+        page_size = 10
+        fetches = []
+
+        async def fetch_page(self, after, before, limit):
+            self.fetches.append((after, before, limit))
+            if before is not None:
+                return [i for i in _ITEMS if i < before[0]][-limit:]
+            return [i for i in _ITEMS if after is None or i > after[0]][:limit]
+
+        def cursor_key(self, item):
+            return [item]
+
+    application = web.Application()
+    Numbers.add_to_router(application.router, '/numbers')
+    application['view'] = Numbers
+    return application
+
+
+@pytest.fixture()
+def client(loop, app, test_client):
+    return loop.run_until_complete(test_client(app))
+
+
+def test_cursor_round_trip():
+    cursor = _pagination.encode_cursor('n', ['foo', 3])
+    assert _pagination.decode_cursor(cursor) == ('n', ['foo', 3])
+    for malformed in ('!!', 'Zm9v', _pagination.encode_cursor('x', [])):
+        with pytest.raises(web.HTTPBadRequest):
+            _pagination.decode_cursor(malformed)
+
+
+async def test_keyset_pagination(client):
+    url, pages = '/numbers', []
+    while True:
+        response = await client.get(url)
+        assert response.status == 200
+        page = await response.json()
+        pages.append(page['items'])
+        if 'next' not in page['_links']:
+            break
+        url = page['_links']['next']['href']
+    assert pages == [_ITEMS[0:10], _ITEMS[10:20], _ITEMS[20:]]
+    assert 'prev' not in (await (await client.get('/numbers')).json())['_links']
+    response = await client.get(page['_links']['prev']['href'])
+    assert (await response.json())['items'] == _ITEMS[10:20]
+    response = await client.get('/numbers?page_size=0')
+    assert response.status == 400
+
+
+async def test_prefetch_next_page(client, app):
+    view_class = app['view']
+    view_class.prefetch_next_page = True
+    page = await (await client.get('/numbers?page_size=5')).json()
+    assert len(view_class.fetches) == 2
+    page = await (await client.get(page['_links']['next']['href'])).json()
+    assert page['items'] == _ITEMS[5:10]
+    # The second page was prefetched; only the third one was fetched since:
+    assert len(view_class.fetches) == 3
+
+
+async def test_prefetch_same_page_twice(client, app):
+    view_class = app['view']
+    view_class.prefetch_next_page = True
+    for _ in range(3):
+        response = await client.get('/numbers?page_size=5')
+        assert response.status == 200
+    # The first page was fetched three times, the second one prefetched once:
+    assert len(view_class.fetches) == 4
+    prefetched = app.rest_utils_prefetched[view_class]
+    assert len(prefetched) == 1
+    (expires, task), = prefetched.values()
+    assert not task.cancelled()
+
+
+async def test_prefetch_per_application(loop, test_client, app):
+    view_class = app['view']
+    view_class.prefetch_next_page = True
+    other_app = web.Application()
+    view_class.add_to_router(other_app.router, '/numbers')
+    for application in (app, other_app):
+        client = await test_client(application)
+        assert (await client.get('/numbers?page_size=5')).status == 200
+    assert app.rest_utils_prefetched[view_class] is not \
+        other_app.rest_utils_prefetched[view_class]
+    assert len(other_app.rest_utils_prefetched[view_class]) == 1
+
+
+def test_abstract_methods():
+    class Numbers(aiohttp_extras.KeysetPaginationMixin, aiohttp_extras.View):
+        async def fetch_page(self, after, before, limit):
+            return []
+
+    with pytest.raises(TypeError, match='cursor_key'):
+        Numbers.add_to_router(web.Application().router, '/numbers')
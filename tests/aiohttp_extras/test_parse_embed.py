@@ -1,3 +1,6 @@
+import pytest
+from aiohttp import web
+
 from aiohttp_extras.serializers.hal_json import _parse_embed
 
 
@@ -16,3 +19,33 @@ def test_happy_path():
     assert embed == EXPECTED
     embed = _parse_embed.parse_embed(_parse_embed.to_string(embed))
     assert embed == EXPECTED
+
+
+def test_result_is_immutable():
+    embed = _parse_embed.parse_embed('foo(bar)')
+    with pytest.raises(TypeError):
+        embed['baz'] = {}
+    with pytest.raises(TypeError):
+        embed['foo']['baz'] = {}
+
+
+@pytest.mark.parametrize('embed', [
+    '(', 'foo(', 'foo)', ',,foo', 'foo((bar))', 'foo,foo', 'self', 'foo bar',
+    'foo(,(bar))',
+])
+def test_syntax_errors(embed):
+    with pytest.raises(web.HTTPBadRequest):
+        _parse_embed.parse_embed(embed)
+
+
+def test_limits():
+    assert _parse_embed.parse_embed('a(b(c))', max_depth=3) == {
+        'a': {'b': {'c': {}}}
+    }
+    with pytest.raises(web.HTTPBadRequest):
+        _parse_embed.parse_embed('a(b(c(d)))', max_depth=3)
+    assert len(_parse_embed.parse_embed('a,b,c', max_width=3)) == 3
+    with pytest.raises(web.HTTPBadRequest):
+        _parse_embed.parse_embed('x(a,b,c,d)', max_width=3)
+    with pytest.raises(web.HTTPBadRequest):
+        _parse_embed.parse_embed('a' * 11, max_length=10)
@@ -0,0 +1,324 @@
+import json
+import os
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+import aiohttp_extras
+from aiohttp_extras import _swagger, _validation
+
+_SWAGGER_PATH = os.path.join(os.path.dirname(__file__), 'openapi.yml')
+
+
+@pytest.fixture(scope='module')
+def index():
+    app = web.Application()
+    _swagger.swaggerize(app, _SWAGGER_PATH)
+    return _swagger.swagger_index(app)
+
+
+@pytest.mark.parametrize('path, method, expected', [
+    ('/api/items', 'GET', '/api/items'),
+    ('/api/items', 'HEAD', '/api/items'),
+    ('/api/items/special', 'GET', '/api/items/special'),
+    ('/api/items/special', 'DELETE', None),
+    ('/api/items/foo', 'DELETE', '/api/items/{id}'),
+    ('/api/items/foo.json', 'GET', '/api/items/{id}.json'),
+    ('/api/items/', 'GET', None),
+    ('/api/items/foo', 'PUT', None),
+    ('/items', 'GET', None),
+])
+def test_index_operation(index, path, method, expected):
+    operation = index.operation(path, method)
+    assert (operation and operation.path) == expected
+
+
+def test_operation_metadata(index):
+    get_items = index.operation('/api/items', 'GET')
+    assert dict(get_items.defaults) == {'page_size': '10', 'sorted': 'false'}
+    assert get_items.security == ({'apiKey': []},)
+    assert set(get_items.responses) == {'200'}
+    assert index.operation('/api/items', 'POST').security == ()
+    assert set(index.operation('/api/items/foo', 'GET').parameters) == {'id'}
+    with pytest.raises(TypeError):
+        get_items.defaults['page_size'] = '20'
+
+
+def test_request_operation(index):
+    app = web.Application()
+    app[_swagger._SWAGGER_INDEX_SYMBOL] = index
+    request = make_mocked_request('GET', '/api/items/foo?x=1', app=app)
+    operation = _swagger.request_operation(request)
+    assert operation is index.operation('/api/items/foo', 'GET')
+    assert _swagger.request_operation(request) is operation
+
+
+def test_schema_compiler():
+    compiler = _validation.SchemaCompiler({
+        'Node': {
+            'type': 'object',
+            'required': ['name'],
+            'additionalProperties': False,
+            'properties': {
+                'name': {'type': 'string', 'pattern': '^[a-z]+$'},
+                'children': {'type': 'array', 'items': {'$ref': '#/definitions/Node'}},
+            },
+        },
+    })
+    validate = compiler.compile({'$ref': '#/definitions/Node'})
+    validate({'name': 'root', 'children': [{'name': 'leaf', 'children': []}]})
+    for value, message in [
+        ([], "must be of type object"),
+        ({'name': 'Root'}, "name: must match ^[a-z]+$"),
+        ({'name': 'a', 'children': [{'name': 'b'}, {}]}, "children[1]: name is required"),
+        ({'name': 'a', 'foo': 1}, "foo: unexpected property"),
+    ]:
+        with pytest.raises(_validation.ValidationError) as excinfo:
+            validate(value)
+        assert str(excinfo.value) == message
+
+
+@pytest.fixture()
+def client(loop, test_client):
+    async def handler(request):
+        if request.method == 'POST':
+            # Validated bodies can still be read:
+            assert 'id' in await request.json()
+        return web.Response(text='OK')
+
+    app = web.Application(middlewares=[_swagger.validation_middleware])
+    _swagger.swaggerize(app, _SWAGGER_PATH)
+    app.router.add_route('*', '/api/items', handler)
+    app.router.add_route('*', '/api/unspecified', handler)
+    return loop.run_until_complete(test_client(app))
+
+
+@pytest.mark.parametrize('method, path, body, status', [
+    ('GET', '/api/items?page_size=100&sorted=true', None, 200),
+    ('GET', '/api/items?page_size=101', None, 400),
+    ('GET', '/api/items?page_size=ten', None, 400),
+    ('GET', '/api/items?sorted=yes', None, 400),
+    ('GET', '/api/unspecified?page_size=ten', None, 200),
+    ('POST', '/api/items', {'id': 'foo', 'count': 1, 'tags': ['a']}, 200),
+    ('POST', '/api/items', {'count': 1}, 400),
+    ('POST', '/api/items', {'id': 'foo', 'tags': ['a', 1]}, 400),
+    ('POST', '/api/items', None, 400),
+    ('POST', '/api/items', '{"id": "foo", "count": 1', 400),
+    ('POST', '/api/items', '{"id": "foo" "count": 1}', 400),
+    ('POST', '/api/items', '{"id": "foo"}]', 400),
+    ('POST', '/api/items', '{"id": "foo", "tags": ["a" "b"]}', 400),
+    ('POST', '/api/items', '{"id": "foo", "tags": ["a"}', 400),
+    ('POST', '/api/items', '{"id" "foo"}', 400),
+    ('POST', '/api/items', '{"id": "\\q"}', 400),
+    ('POST', '/api/items', b'{"id": "\xff"}', 400),
+])
+async def test_validation_middleware(client, method, path, body, status):
+    if isinstance(body, (str, bytes)):
+        response = await client.request(method, path, data=body)
+    else:
+        response = await client.request(method, path, json=body)
+    assert response.status == status, await response.text()
+
+
+def test_swaggerize_cache(tmpdir, monkeypatch):
+    swagger_path = str(tmpdir.join('openapi.yml'))
+    cache_path = str(tmpdir.join('openapi.cache'))
+    with open(_SWAGGER_PATH) as source, open(swagger_path, 'w') as target:
+        target.write(source.read())
+    app = web.Application()
+    _swagger.swaggerize(app, swagger_path, cache_path=cache_path)
+    assert os.path.exists(cache_path)
+    assert tmpdir.listdir(lambda p: p.ext == '.tmp') == []
+
+    parses = []
+    original = _swagger.swagger_parser.SwaggerParser
+
+    def counting_parser(*args, **kwargs):
+        parses.append(True)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(_swagger.swagger_parser, 'SwaggerParser', counting_parser)
+    app = web.Application()
+    _swagger.swaggerize(app, swagger_path, cache_path=cache_path)
+    assert parses == []
+    assert _swagger.swagger_index(app).operation('/api/items', 'GET') is not None
+
+    with open(swagger_path, 'a') as f:
+        f.write('\n# changed\n')
+    _swagger.swaggerize(web.Application(), swagger_path, cache_path=cache_path)
+    assert parses == [True]
+
+    with open(cache_path, 'wb') as f:
+        f.write(b'garbage')
+    _swagger.swaggerize(web.Application(), swagger_path, cache_path=cache_path)
+    assert parses == [True, True]
+
+
+async def test_options_and_method_not_allowed(loop, test_client):
+    class Item(aiohttp_extras.View):
+        async def to_dict(self):
+            return {}
+
+    class Unspecified(aiohttp_extras.View):
+        pass
+
+    app = web.Application()
+    _swagger.swaggerize(app, _SWAGGER_PATH)
+    Item.add_to_router(app.router, '/api/items/{id}')
+    Unspecified.add_to_router(app.router, '/api/unspecified')
+    client = await test_client(app)
+
+    response = await client.options('/api/items/foo')
+    assert response.status == 200
+    assert response.headers['Allow'] == 'DELETE,GET,HEAD,OPTIONS'
+    assert set(json.loads(await response.text())) == {'get', 'delete'}
+    response = await client.put('/api/items/foo')
+    assert response.status == 405
+    assert response.headers['Allow'] == 'DELETE,GET,HEAD,OPTIONS'
+    assert Item._swagger_path_item[1] is _swagger.swagger_index(app).path_items['/api/items/{id}']
+
+    response = await client.options('/api/unspecified')
+    assert response.headers['Allow'] == 'GET,HEAD,OPTIONS'
+
+
+async def test_default_query_params(loop, test_client):
+    class Items(aiohttp_extras.View):
+        async def to_dict(self):
+            return dict(self.query)
+
+    app = web.Application()
+    _swagger.swaggerize(app, _SWAGGER_PATH)
+    Items.add_to_router(app.router, '/api/items')
+    client = await test_client(app)
+
+    response = await client.get('/api/items?embed=foo')
+    assert await response.json() == {'page_size': '10', 'sorted': 'false', 'embed': 'foo'}
+    assert response.headers['Content-Location'] == \
+        '/api/items?page_size=10&sorted=false&embed=foo'
+    request = make_mocked_request('GET', '/api/items', app=app)
+    view = Items.from_match(request, {})
+    assert view.default_query_params is \
+        _swagger.swagger_index(app).operation('/api/items', 'GET').defaults
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1024])
+def test_stream_validator(chunk_size):
+    compiler = _validation.SchemaCompiler({
+        'Item': {
+            'type': 'object',
+            'required': ['id'],
+            'properties': {
+                'id': {'type': 'string'},
+                'children': {'type': 'array', 'items': {'$ref': '#/definitions/Item'}},
+            },
+        },
+    })
+    node = compiler.compile_node({
+        'type': 'object',
+        'properties': {'items': {'type': 'array', 'maxItems': 2,
+                                 'items': {'$ref': '#/definitions/Item'}}},
+    })
+    any_node = compiler.compile_node({})
+
+    def validate(document, node=node):
+        validator = _validation.StreamValidator(node)
+        data = document.encode()
+        for i in range(0, len(data), chunk_size):
+            validator.feed(data[i:i + chunk_size])
+        validator.close()
+        return None if validator.error is None else str(validator.error)
+
+    assert validate('{"items": [{"id": "a\\"é", "children": [{"id": "b"}]}], "x": 1.5e3}') is None
+    assert validate('{"items": [{"id": "a", "children": [{"id": 5}]}]}') == \
+        'items[0].children[0].id: must be of type string'
+    assert validate('{"items": [{"id": "a"}, {}]}') == 'items[1]: id is required'
+    assert validate('{"items": [{"id": "a"}, {"id": "b"}, {"id": "c"}]}') == \
+        'items[2]: must have at most 2 items'
+    assert validate('{"items": {}}') == 'items: must be of type array'
+    assert validate('{"items": [') == 'truncated JSON document'
+    assert validate('{"items": [] x') == 'items: malformed JSON'
+    assert validate('{"items": [], "x": 1.5x}') == 'x: malformed JSON'
+    assert validate('{"items": [], "x": {}, "y": [[], [1, {}]]}') is None
+    assert validate('[1, {"a": [true, null]}, "b"]', any_node) is None
+    # Malformed documents are validation errors, not exceptions:
+    for document in (']', '[1]]', '[1],', '{"a": 1]', '[1 2]', '{"a" 1}',
+                     '{"a": }', '{"a"}', '[1,]', '{,}', '{1: 2}', '[:]',
+                     '["\\q"]', '{"items": [}'):
+        error = validate(document, any_node)
+        assert error is not None and error.endswith('malformed JSON'), document
+    validator = _validation.StreamValidator(node)
+    validator.feed(b'{"items": "\xff"}')
+    validator.close()
+    assert str(validator.error) == 'invalid UTF-8'
+
+
+async def test_sampled_response_validation(loop, test_client):
+    results = []
+
+    class Item(aiohttp_extras.View):
+        response_validation_rate = 1.0
+
+        @staticmethod
+        def response_validation_sink(view, error):
+            results.append((view['id'], error and str(error)))
+
+        async def to_dict(self):
+            if self['id'] == 'bad':
+                return {'id': 42}
+            return {'id': self['id'], 'tags': ['a', 'b']}
+
+    app = web.Application()
+    _swagger.swaggerize(app, _SWAGGER_PATH)
+    Item.add_to_router(app.router, '/api/items/{id}')
+    client = await test_client(app)
+    for id in ('good', 'bad'):
+        response = await client.get('/api/items/' + id)
+        assert response.status == 200
+        await response.read()
+    assert results == [('good', None), ('bad', 'id: must be of type string')]
+
+
+async def test_response_validation_never_breaks_responses(loop, test_client, monkeypatch):
+    results = []
+    bodies = {
+        'malformed': b'{"id": "a"}]',
+        'truncated': b'{"id": "a", "tags": [',
+        'crash': b'{"id": "a"}',
+    }
+
+    class Item(aiohttp_extras.View):
+        response_validation_rate = 1.0
+
+        @staticmethod
+        def response_validation_sink(view, error):
+            results.append((view['id'], error and str(error)))
+            raise RuntimeError("sinks mustn't break responses either")
+
+    async def serializer(view):
+        async def chunks():
+            body = bodies[view['id']]
+            for i in range(0, len(body), 4):
+                yield body[i:i + 4]
+        return chunks()
+
+    Item.add_serializer('application/json; charset=utf-8', serializer)
+    app = web.Application()
+    _swagger.swaggerize(app, _SWAGGER_PATH)
+    Item.add_to_router(app.router, '/api/items/{id}')
+    client = await test_client(app)
+
+    def crash(self, kind, text):
+        raise RuntimeError("validator bug")
+
+    for id, body in bodies.items():
+        if id == 'crash':
+            monkeypatch.setattr(_validation.StreamValidator, '_token', crash)
+        response = await client.get('/api/items/' + id)
+        assert response.status == 200
+        assert await response.read() == body
+    assert results == [
+        ('malformed', 'malformed JSON'),
+        ('truncated', 'truncated JSON document'),
+        ('crash', 'validator bug'),
+    ]
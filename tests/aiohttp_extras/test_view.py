@@ -0,0 +1,421 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+import aiohttp_extras
+
+
+@pytest.fixture()
+def app():
+    class Item(aiohttp_extras.View):
+        async def to_dict(self):
+            return {
+                'id': self['id'],
+                'values': list(range(int(self.query.get('n', '3')))),
+            }
+
+    class Items(aiohttp_extras.View):
+        default_query_params = {'page_size': '10'}
+
+        async def to_dict(self):
+            return dict(self.query)
+
+    application = web.Application()
+    Item.add_to_router(application.router, '/items/{id}')
+    Items.add_to_router(application.router, '/items')
+    application['views'] = {'item': Item, 'items': Items}
+    return application
+
+
+@pytest.fixture()
+def client(loop, app, test_client):
+    return loop.run_until_complete(test_client(app))
+
+
+async def test_get_small_body(client):
+    response = await client.get('/items/foo', headers={'Accept-Encoding': 'gzip'})
+    assert response.status == 200
+    assert response.headers['Content-Type'] == 'application/json; charset=utf-8'
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    body = await response.read()
+    assert int(response.headers['Content-Length']) == len(body)
+    assert json.loads(body.decode()) == {'id': 'foo', 'values': [0, 1, 2]}
+
+
+async def test_get_streams_large_body(client):
+    response = await client.get(
+        '/items/foo?n=300000', headers={'Accept-Encoding': 'gzip'}
+    )
+    assert response.status == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    data = json.loads((await response.read()).decode())
+    assert data['values'] == list(range(300000))
+
+
+async def test_get_not_acceptable(client):
+    response = await client.get('/items/foo', headers={'Accept': 'text/html'})
+    assert response.status == 406
+
+
+async def test_head_skips_serialization(client, app):
+    view_class = app['views']['item']
+
+    async def fail(self):
+        raise AssertionError("HEAD must not build a representation")
+
+    view_class.to_dict = fail
+    response = await client.head('/items/foo')
+    assert response.status == 200
+    assert response.headers['Content-Type'] == 'application/json; charset=utf-8'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+async def test_no_json_representation(loop, test_client):
+    class Text(aiohttp_extras.View):
+        pass
+
+    async def serializer(view):
+        async def chunks():
+            yield b'text'
+        return chunks()
+
+    Text.add_serializer('text/plain; charset=utf-8', serializer)
+    application = web.Application()
+    Text.add_to_router(application.router, '/text')
+    client = await test_client(application)
+    response = await client.get('/text', headers={'Accept': 'application/json'})
+    assert response.status == 406
+    response = await client.get('/text', headers={'Accept': 'text/plain'})
+    assert await response.text() == 'text'
+
+
+def test_from_match(app):
+    view_class = app['views']['item']
+    request = make_mocked_request('GET', '/items/foo', app=app)
+    view = view_class.from_match(request, {'id': 'bar baz'})
+    assert view['id'] == 'bar baz'
+    assert view.request is request
+    assert str(view.rel_url) == '/items/bar%20baz'
+    assert view.rel_url == view_class(request, {'id': 'bar baz'}).rel_url
+
+
+async def test_content_location(client, app):
+    response = await client.get('/items?page_size=10')
+    assert 'Content-Location' not in response.headers
+    response = await client.get('/items?embed=foo')
+    assert response.headers['Content-Location'] == '/items?page_size=10&embed=foo'
+    assert await response.json() == {'page_size': '10', 'embed': 'foo'}
+    assert list(app['views']['items']._canonical_queries) == ['page_size=10', 'embed=foo']
+
+
+async def test_coalesce_requests(client, app):
+    view_class = app['views']['item']
+    calls = []
+    original = view_class.to_dict
+
+    async def to_dict(self):
+        calls.append(self['id'])
+        await asyncio.sleep(0.05)
+        return await original(self)
+
+    view_class.to_dict = to_dict
+    view_class.coalesce_requests = True
+
+    async def get(path, **headers):
+        response = await client.get(path, headers=headers)
+        assert response.status == 200
+        return json.loads((await response.read()).decode())
+
+    results = await asyncio.gather(
+        get('/items/foo?n=1000'),
+        get('/items/foo?n=1000', **{'Accept-Encoding': 'identity'}),
+        get('/items/foo?n=1000', Authorization='Bearer x'),
+        get('/items/bar?n=1000'),
+    )
+    assert sorted(calls) == ['bar', 'foo', 'foo']
+    assert results[0] == results[1] == results[2]
+    assert results[3]['id'] == 'bar'
+    assert len(view_class._flights._flights) == 0
+
+
+async def test_single_flight_replay_limit(loop):
+    from aiohttp_extras import _single_flight
+    queues = []
+
+    async def generate():
+        queue = asyncio.Queue()
+        queues.append(queue)
+
+        async def chunks():
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    return
+                yield chunk
+        return chunks()
+
+    async def consume(subscription):
+        try:
+            return b''.join([chunk async for chunk in subscription])
+        finally:
+            subscription.close()
+
+    single_flight = _single_flight.SingleFlight(replay_limit=25)
+    first = loop.create_task(consume(single_flight.subscribe('key', generate)))
+    await asyncio.sleep(0.01)
+    queues[0].put_nowait(b'x' * 20)
+    await asyncio.sleep(0.01)
+    # Late joiners catch up from the replay buffer:
+    second = loop.create_task(consume(single_flight.subscribe('key', generate)))
+    queues[0].put_nowait(b'y' * 20)
+    await asyncio.sleep(0.01)
+    # The replay buffer has overflowed, so this starts a new generation:
+    third = loop.create_task(consume(single_flight.subscribe('key', generate)))
+    await asyncio.sleep(0.01)
+    assert len(queues) == 2
+    queues[0].put_nowait(b'z')
+    queues[0].put_nowait(None)
+    queues[1].put_nowait(None)
+    results = await asyncio.gather(first, second, third)
+    assert results[0] == results[1] == b'x' * 20 + b'y' * 20 + b'z'
+    assert results[2] == b''
+
+
+async def test_representation_cache(client, app):
+    view_class = app['views']['item']
+    calls = []
+    original = view_class.to_dict
+
+    async def to_dict(self):
+        calls.append(self['id'])
+        return await original(self)
+
+    async def etag(self):
+        return '"v1"'
+
+    view_class.to_dict = to_dict
+    view_class.etag = etag
+    view_class.representation_cache = aiohttp_extras.RepresentationCache(1024 * 1024)
+    for accept_encoding in ('identity', 'identity', 'gzip', 'gzip'):
+        response = await client.get(
+            '/items/foo?n=1000', headers={'Accept-Encoding': accept_encoding}
+        )
+        assert response.status == 200
+        assert response.headers['ETag'] == (
+            '"v1-gzip"' if accept_encoding == 'gzip' else '"v1"'
+        )
+        assert 'Content-Length' in response.headers
+        data = json.loads((await response.read()).decode())
+        assert data['values'] == list(range(1000))
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert calls == ['foo']
+    cache = view_class.representation_cache
+    assert (cache.hits, cache.misses, len(cache)) == (3, 1, 1)
+
+
+async def test_head_matches_cached_get(client, app):
+    view_class = app['views']['item']
+
+    async def etag(self):
+        return '"v1"'
+
+    view_class.etag = etag
+    view_class.representation_cache = aiohttp_extras.RepresentationCache(1024 * 1024)
+    view_class.stale_if_error = 3600
+    names = ('Content-Type', 'Content-Length', 'Content-Encoding', 'ETag',
+             'Vary', 'Cache-Control')
+    for accept_encoding in ('identity', 'gzip'):
+        headers = {'Accept-Encoding': accept_encoding}
+        get = await client.get('/items/foo?n=1000', headers=headers)
+        await get.read()
+        head = await client.head('/items/foo?n=1000', headers=headers)
+        assert head.status == 200
+        assert [head.headers.get(name) for name in names] == \
+            [get.headers.get(name) for name in names]
+    assert head.headers['Content-Encoding'] == 'gzip'
+    assert head.headers['ETag'] == '"v1-gzip"'
+
+
+async def test_head_matches_uncached_get(client, app):
+    view_class = app['views']['item']
+
+    async def etag(self):
+        return '"v1"'
+
+    view_class.etag = etag
+    # Content-Length: is unknown without a cached representation:
+    names = ('Content-Type', 'Content-Encoding', 'ETag', 'Vary')
+    for accept_encoding in ('identity', 'gzip'):
+        headers = {'Accept-Encoding': accept_encoding}
+        head = await client.head('/items/foo?n=1000', headers=headers)
+        assert head.status == 200
+        get = await client.get('/items/foo?n=1000', headers=headers)
+        await get.read()
+        assert [head.headers.get(name) for name in names] == \
+            [get.headers.get(name) for name in names]
+    assert head.headers['Content-Encoding'] == 'gzip'
+    assert head.headers['ETag'] == '"v1-gzip"'
+
+
+async def test_stale_while_revalidate(client, app):
+    view_class = app['views']['item']
+    version = ['"v1"']
+    rendered = []
+    original = view_class.to_dict
+
+    async def to_dict(self):
+        rendered.append(version[0])
+        if version[0] == '"broken"':
+            raise ValueError()
+        return dict(await original(self), version=version[0])
+
+    async def etag(self):
+        return version[0]
+
+    view_class.to_dict = to_dict
+    view_class.etag = etag
+    view_class.representation_cache = aiohttp_extras.RepresentationCache(1024 * 1024)
+    view_class.stale_while_revalidate = 60
+    view_class.stale_if_error = 3600
+
+    async def get():
+        response = await client.get('/items/foo')
+        assert response.status == 200
+        assert 'stale-if-error=3600' in response.headers['Cache-Control']
+        data = await response.json()
+        assert response.headers['ETag'] == data['version']
+        return data['version']
+
+    assert await get() == '"v1"'
+    version[0] = '"v2"'
+    assert await get() == '"v1"'
+    await asyncio.sleep(0.01)
+    assert rendered == ['"v1"', '"v2"']
+    assert await get() == '"v2"'
+    view_class.stale_while_revalidate = None
+    version[0] = '"broken"'
+    assert await get() == '"v2"'
+
+
+async def test_revalidate_without_request_state(loop, test_client):
+    version = ['"v1"']
+    rendered = []
+
+    class Item(aiohttp_extras.View):
+        representation_cache = aiohttp_extras.RepresentationCache(1024 * 1024)
+        stale_while_revalidate = 60
+
+        async def etag(self):
+            return version[0]
+
+        async def to_dict(self):
+            connection = self.request.get('connection')
+            if connection is not None and connection['closed']:
+                raise RuntimeError("Connection closed")
+            rendered.append((version[0], self.request.headers.get('X-Test')))
+            return {'version': version[0], 'query': dict(self.query)}
+
+    async def middleware(app, handler):
+        async def middleware_handler(request):
+            # A request-scoped resource, released after the response:
+            connection = request['connection'] = {'closed': False}
+            try:
+                return await handler(request)
+            finally:
+                connection['closed'] = True
+        return middleware_handler
+
+    application = web.Application(middlewares=[middleware])
+    Item.add_to_router(application.router, '/items/{id}')
+    client = await test_client(application)
+
+    async def get():
+        response = await client.get('/items/foo?x=1', headers={'X-Test': 'yes'})
+        assert response.status == 200
+        return await response.json()
+
+    assert (await get())['version'] == '"v1"'
+    version[0] = '"v2"'
+    assert (await get())['version'] == '"v1"'
+    await asyncio.sleep(0.01)
+    # Regenerated for the same URL and headers, without the closed connection:
+    assert rendered == [('"v1"', 'yes'), ('"v2"', 'yes')]
+    assert await get() == {'version': '"v2"', 'query': {'x': '1'}}
+
+
+def test_resolve_url():
+    views = {}
+    router = web.Application().router
+    for name, path in [
+        ('root', '/'),
+        ('items', '/items'),
+        ('item', '/items/{id}'),
+        ('special', '/items/special'),
+        ('item_json', '/items/{id}.json'),
+        ('files', '/files/{path:.+}'),
+    ]:
+        views[name] = type(name, (aiohttp_extras.View,), {})
+        views[name].add_to_router(router, path)
+    resolve = aiohttp_extras.View.resolve_url
+    assert resolve(router, '/') == (views['root'], {})
+    assert resolve(router, '/items?embed=item') == (views['items'], {})
+    assert resolve(router, '/items/foo%20bar') == (views['item'], {'id': 'foo bar'})
+    assert resolve(router, '/items/special') == (views['special'], {})
+    assert resolve(router, '/items/foo.json') == (views['item'], {'id': 'foo.json'})
+    assert resolve(router, '/files/a/b') == (views['files'], {'path': 'a/b'})
+    assert resolve(router, '/items/') is None
+    assert resolve(router, '/nothing') is None
+
+
+def test_resolve_url_after_adding_routes():
+    app = web.Application()
+    items = type('items', (aiohttp_extras.View,), {})
+    items.add_to_router(app.router, '/items')
+    resolve = aiohttp_extras.View.resolve_url
+    assert resolve(app.router, '/items') == (items, {})
+    assert resolve(app.router, '/api/members/1') is None
+    # Views added later, and views in sub-applications, are found too:
+    item = type('item', (aiohttp_extras.View,), {})
+    item.add_to_router(app.router, '/items/{id}')
+    subapp = web.Application()
+    member = type('member', (aiohttp_extras.View,), {})
+    member.add_to_router(subapp.router, '/members/{id}')
+    app.add_subapp('/api', subapp)
+    assert resolve(app.router, '/items/1') == (item, {'id': '1'})
+    assert resolve(app.router, '/api/members/1') == (member, {'id': '1'})
+
+
+async def test_embed_concurrency(loop, test_client):
+    class Member(aiohttp_extras.View):
+        active = 0
+        max_active = 0
+
+        async def to_dict(self):
+            cls = type(self)
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+            await asyncio.sleep(0.001)
+            cls.active -= 1
+            return {'id': self['id']}
+
+    class Members(aiohttp_extras.View):
+        embed_concurrency = 2
+
+        async def to_dict(self):
+            return {'items': [
+                Member.from_match(self.request, {'id': str(i)})
+                for i in range(10)
+            ]}
+
+    application = web.Application()
+    Member.add_to_router(application.router, '/members/{id}')
+    Members.add_to_router(application.router, '/members')
+    client = await test_client(application)
+    data = await (await client.get('/members')).json()
+    assert [item['id'] for item in data['items']] == [str(i) for i in range(10)]
+    assert Member.max_active == 2